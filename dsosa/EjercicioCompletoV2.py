@@ -1,8 +1,17 @@
-import serial
+import os
+import sys
 import time
+import serial
+
+# El envio con ventana de "ok" vive junto a la clase Arm (omaldonado/marlin.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "omaldonado"))
+from cinematica import Estimador
+from compilador import compilar_bytes
+from marlin import MarlinStream
 
 PORT = "COM4"
 BAUD = 115200
+NUMERAR = False   # True: lineas con N y checksum (permite subir BAUD a 250000/500000)
 
 gcode_commands = [
     "M17",          # Encender motores
@@ -42,41 +51,32 @@ gcode_commands = [
     "M84"  
 ]
 
-def send_gcode():
-    try:
-        ser = serial.Serial(PORT, BAUD, timeout=2)
-        time.sleep(2)  # Esperar a que Marlin inicie
-        print("Conectado a", PORT)
-
-        # Vaciar el buffer
-        ser.reset_input_buffer()
+#Abre el puerto y espera a que Marlin este listo (banner "start" / M115), sin sleep fijo
+def abrir():
+    ser = serial.Serial(PORT, BAUD, timeout=2)
+    ser.reset_input_buffer()  # Vaciar el buffer
+    stream = MarlinStream(ser, numerar=NUMERAR, estimador=Estimador())  # plazo por comando
+    stream.esperar_listo()
+    print("Conectado a", PORT)
+    return stream
 
-        for cmd in gcode_commands:
-            ser.write((cmd + "\n").encode())
-            print(">>", cmd)
+#Corre el programa sobre una conexion ya abierta (la usa tambien programaMQTTsimon)
+def ejecutar(stream):
+    t0, est0 = time.time(), stream.estimado
 
-            # Esperar confirmación "ok"
-            response = ""
-            start = time.time()
-            while True:
-                if ser.in_waiting > 0:
-                    line = ser.readline().decode(errors='ignore').strip()
-                    if line:
-                        print("<<", line)
-                        if line.lower().startswith("ok"):
-                            break
-                # Evita bloqueo eterno
-                if time.time() - start > 5:
-                    print("//// Timeout esperando 'ok' de Marlin")
-                    break
+    # Programa compilado (sin T0/M400 de mas, queda en cache) y sin esperar cada "ok"
+    stream.send_compilado(compilar_bytes(gcode_commands))
 
-        # Esperar a que se vacíe el buffer y que termine el último movimiento
-        ser.write(b"M400\n")
-        ser.flush()
-        time.sleep(3)
+    # Esperar a que se vacíe el buffer y que termine el último movimiento
+    stream.sync()
+    print(f"Ciclo: estimado {stream.estimado - est0:.2f} s, real {time.time() - t0:.2f} s")
 
+def send_gcode():
+    try:
+        stream = abrir()
+        ejecutar(stream)
         print("vvvv Programa terminado correctamente.")
-        ser.close()
+        stream.close()
 
     except Exception as e:
         print("XXX Error:", e)
@@ -1,13 +1,23 @@
 import paho.mqtt.client as mqtt
-import subprocess
-import sys
 import os
+import queue
+import sys
+import threading
+import time
+
+# Servicio que queda corriendo: abre el serial UNA sola vez y ejecuta el programa de
+# EjercicioCompletoV2 cada vez que llega un "1", sin lanzar un proceso nuevo por mensaje
+# (cada proceso reabria COM4, reseteaba el Mega por DTR y dormia 2 s).
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import EjercicioCompletoV2 as ejercicio
 
 # Variable global para guardar el último mensaje recibido
 mensajeMQTT = None
 
-# Nombre del archivo en la misma carpeta
-EJERCICIO2_PATH = "ejercicioCompletoV2.py"
+# Trabajos pendientes: el callback de MQTT solo encola, el hilo del brazo los ejecuta en orden
+trabajos = queue.Queue()
+stream = None
 
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
@@ -15,6 +25,7 @@ def on_connect(client, userdata, flags, rc):
         client.subscribe("apuCrack")
     else:
         print(f" Error de conexión. Código: {rc}")
+
 def on_message(client, userdata, msg):
     global mensajeMQTT
     try:
@@ -28,26 +39,46 @@ def on_message(client, userdata, msg):
 
     if payload == "1":
         print("llego 1")
-        # Verificamos que exista el archivo antes de intentar ejecutarlo
-        if not os.path.exists(EJERCICIO2_PATH):
-            print(f" No se encontró {EJERCICIO2_PATH}. Revisa la ruta y el nombre.")
-            return
-        try:
-            # Ejecuta el script en un proceso separado con el mismo intérprete
-            subprocess.Popen([sys.executable, EJERCICIO2_PATH])
-            print(f" Ejecutando {EJERCICIO2_PATH} en un proceso separado.")
-        except Exception as e:
-            print("Error al lanzar el script:", e)
+        # Dos mensajes seguidos ya no pelean por el puerto: se ejecutan uno detras del otro
+        trabajos.put(time.perf_counter())
+        print(f" Programa encolado ({trabajos.qsize()} en espera).")
     else:
         print(f" Mensaje recibido en {msg.topic}: {payload}")
 
-# --- Configuración del cliente ---
-client = mqtt.Client()
-client.on_connect = on_connect
-client.on_message = on_message
+#Hilo que ejecuta los trabajos sobre la conexion ya abierta
+def worker():
+    while True:
+        t_llegada = trabajos.get()
+        try:
+            print(f" Ejecutando programa (latencia {1000 * (time.perf_counter() - t_llegada):.1f} ms).")
+            ejercicio.ejecutar(stream)
+            print(f" Programa terminado en {time.perf_counter() - t_llegada:.1f} s.")
+        except Exception as e:
+            print("Error al ejecutar el programa:", e)
+        finally:
+            trabajos.task_done()
+
+def main():
+    global stream
+    # --- Serial: se abre una sola vez al iniciar el servicio ---
+    stream = ejercicio.abrir()
+    threading.Thread(target=worker, name="brazo", daemon=True).start()
 
-# Conectar al broker público HiveMQ
-client.connect("broker.hivemq.com", 1883, 60)
+    # --- Configuración del cliente ---
+    client = mqtt.Client()
+    client.on_connect = on_connect
+    client.on_message = on_message
+
+    # Conectar al broker público HiveMQ
+    client.connect("broker.hivemq.com", 1883, 60)
+
+    # Mantener la conexión activa (bloqueante)
+    try:
+        client.loop_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stream.close()
 
-# Mantener la conexión activa (bloqueante)
-client.loop_forever()
+if __name__ == "__main__":
+    main()
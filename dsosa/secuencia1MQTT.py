@@ -1,5 +1,12 @@
+import os
+import sys
 import serial
-import time
+
+# El envio con ventana de "ok" vive junto a la clase Arm (omaldonado/marlin.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "omaldonado"))
+from cinematica import Estimador
+from compilador import compilar_bytes
+from marlin import MarlinStream
 
 ##ESTA SECUENCIA MUEVE DE UN EXTREMO DE LA MESA HACIA OTRO.
 
@@ -44,23 +51,19 @@ def send_gcode():
     try:
         # Abrir conexión serie
         ser = serial.Serial(PORT, BAUDRATE, timeout=2)
-        time.sleep(2)  # Esperar a que Marlin reinicie y esté listo
-        
+        ser.reset_input_buffer()
+        stream = MarlinStream(ser, estimador=Estimador())  # plazo de cada "ok" segun el movimiento
+        stream.esperar_listo()  # banner "start" / M115 en vez de esperar 2 s fijos
+
         print("Conectado a", PORT)
-        
-        for cmd in gcode_commands:
-            ser.write((cmd + "\n").encode())  # Mandar comando
-            print(">>", cmd)
-            time.sleep(0.5)  # Pausa entre comandos (ajustable)
- # ---------------------
-        # ESPERA FINAL PARA QUE SE EJECUTEN LOS ÚLTIMOS COMANDOS
-        time.sleep(2)         # Espera extra 2 segundos
-        ser.write(b"\n\n")    # Envía un par de saltos de línea extra
-        ser.flush()           # Asegura que se envíe todo lo que queda en el buffer
-        time.sleep(2)         # Otra espera por seguridad
-        # ---------------------
+
+        # Mandamos sin pausas fijas: solo esperamos cuando Marlin tiene la cola llena
+        stream.send_compilado(compilar_bytes(gcode_commands))  # sin T0/M400 de mas
+
+        # ESPERA FINAL: M400 + "ok" confirma que terminaron los últimos movimientos
+        stream.sync()
         print("Programa terminado. Motores siguen energizados.")
-        ser.close()
+        stream.close()
 
     except Exception as e:
         print("Error:", e)
@@ -1,14 +1,23 @@
 #Programa donde defino funciones de movimiento, dependiendo el comando que lee va a ser la secuencia que va a ejecutar el brazo
 
+import threading
 import time
 import serial
 
+from cinematica import Estimador
+from gcode import Coalescedor
+from marlin import Detenido, MarlinStream
+
 class Arm:
-    def __init__(self, port: str, baud: int = 115200, name: str = "Brazo"):
+    def __init__(self, port: str, baud: int = 115200, name: str = "Brazo", numerar: bool = False):
         self.port = port
         self.baud = baud
         self.name = name
+        self.numerar = numerar   # lineas con N y checksum (Marlin pide Resend si llegan mal)
         self.ser = None
+        self.stream = None
+        self.coal = Coalescedor()   # sombra del estado modal (ver gcode.py)
+        self.on_error = None   # callback(evento) cuando Marlin responde "Error:"
 
         # --- Servo ---
         self.SERVO_INDEX    = 0
@@ -32,36 +41,50 @@ class Arm:
 
         self.WRIST_ROLL_TO_VERTICAL = +25
 
+        # --- Jog (move_delta) ---
+        # Limites blandos en posicion absoluta (mm/grados de Marlin), ajustar a cada brazo
+        self.SOFT_LIMITS = {"Y": (-180, 180), "Z": (-45, 45), "X": (-20, 20), "E": (-60, 60)}
+        self.JOG_COLA_S   = 0.15   # segundos de movimiento en cola como maximo antes de mandar otro
+        self.JOG_POLL_S   = 0.02   # cada cuanto se mira si el planner ya tiene lugar
+        self.JOG_MAX_S    = 0.5    # lo acumulado no pasa de lo que se recorre en este tiempo
+
+        self._lock = threading.RLock()      # macros y jog no se mezclan en el serial
+        self._jog = {}                      # deltas acumulados que todavia no se mandaron
+        self._jog_feed = self.FEED_NORM
+        self._jog_cond = threading.Condition()
+        self._jog_hilo = None
+        self._jog_activo = False
+
     #---Funciones auxiliares del Serial---
 
-    #Envia un mensaje con confirmacion del "Ok"
-    def _send(self, cmd, espera=0.02): 
-        """Envía G-code y espera 'ok' de forma simple."""
-        self.ser.write((cmd + "\n").encode("ascii"))
-        print(f">> {cmd}")
-        t0 = time.time(); buf = b""
-        while True:
-            if time.time() - t0 > 2:
-                break
-            chunk = self.ser.read(256)
-            if chunk:
-                buf += chunk
-                if b"ok" in buf or b"OK" in buf:
-                    break
-        time.sleep(espera)
+    #Encola un mensaje; el "Ok" se espera con ventana deslizante (ver marlin.py)
+    def _send(self, cmd):
+        """Envía G-code sin frenar el planner, salteando lo que no cambia el estado de Marlin."""
+        self._emitir(self.coal.agregar(cmd))
+
+    def _emitir(self, lineas):
+        for linea in lineas:
+            self.stream.send(linea)
 
-    #Envia un mensaje por serial sin necesidad de esperar el "Ok"
-    def _raw(self, cmd, pausa_s=0.0):
-        """Escritura 'cruda' (para M280/G4 del servo)."""
-        self.ser.write((cmd + "\n").encode("ascii"))
-        print(f">> (raw) {cmd}")
-        if pausa_s > 0:
-            time.sleep(pausa_s)
+    #Se llama desde el hilo lector apenas Marlin informa un error
+    def _on_error(self, ev):
+        print(f"[{self.name}] Marlin: {ev.linea}")
+        if self.on_error:
+            self.on_error(ev)
+
+    #Espera a que Marlin confirme todo lo enviado y termine el ultimo movimiento
+    def sync(self):
+        self._send("M400")   # el coalescedor lo saltea si no hubo movimiento
+        self.stream.wait()
 
     #Funcion que mueve la pinza al angulo solicitado
+    # M280 se ejecuta apenas Marlin lo lee: el M400 hace que espere a que termine el
+    # movimiento anterior (el coalescedor lo saltea si no hubo movimiento).
+    # El G4 lo cumple Marlin en cola, no hace falta dormir en la PC
     def servo(self, angle):
-        self._raw(f"M280 P{self.SERVO_INDEX} S{int(angle)}")
-        self._raw(f"G4 P{self.SERVO_DWELL_MS}", pausa_s=self.SERVO_DWELL_MS/1000)
+        self._send("M400")
+        self._send(f"M280 P{self.SERVO_INDEX} S{int(angle)}")
+        self._send(f"G4 P{self.SERVO_DWELL_MS}")
 
     #Funcion que cierra, abre y vuelve a cerrar el servomotor
     def servo_close_open_close(self):
@@ -72,41 +95,91 @@ class Arm:
     #Funcion que activa y prepara el brazo para operar
     def open(self):
         self.ser = serial.Serial(self.port, baudrate=self.baud, timeout=1, write_timeout=1)
-        time.sleep(1.2)
+        self.ser.reset_input_buffer()
+        # El estimador le da a cada "ok" un plazo segun lo que tarda el movimiento
+        self.stream = MarlinStream(self.ser, numerar=self.numerar, estimador=Estimador())
+        self.stream.on_error = self._on_error
+        t = self.stream.esperar_listo()   # banner "start" / M115 en vez de un sleep fijo
+        print(f"[{self.name}] Marlin listo en {t:.2f}s")
+        # Posicion real de Marlin para la sombra (relativos -> absolutos)
+        self.stream.send("M114")
+        self.stream.wait()
+        # (sin respuesta asumimos la posicion de reposo, como Marlin al arrancar)
+        self.coal = Coalescedor(self.stream.posicion or {k: 0.0 for k in "XYZE"})
         self._send("M17")
         self._send("G21")
-        self._send("G90")  # arrancamos en absoluto
+        self._emitir(self.coal.preambulo())  # arrancamos en absoluto (E relativo)
         self._send("M204 P200 T200 R100")
         self._send("M205 X2 Y2 Z2 E2")
         self._send("M205 J0.01")
+        self.stream.wait()
+        self._jog_activo = True
+        self._jog_hilo = threading.Thread(target=self._jog_loop, name=f"{self.name}-jog", daemon=True)
+        self._jog_hilo.start()
         print(f"[{self.name}] Serial listo en {self.port}@{self.baud}")
 
     #Funcion que apaga y cierra todo correctamente en el serial
-    def close(self):
-        self._send("M18")
-        if self.ser and self.ser.is_open:
-            self.ser.close()
+    def close(self, reenable_endstops: bool = False, keep_on: bool = False):
+        with self._jog_cond:
+            self._jog_activo = False
+            self._jog = {}
+            self._jog_cond.notify_all()
+        if self._jog_hilo:
+            self._jog_hilo.join(timeout=1)
+        try:
+            self._rearmar()
+            if reenable_endstops:
+                self._send("M120")
+            if not keep_on:
+                self._send("M18")
+            self.stream.wait()
+        except Detenido:
+            pass
+        self.stream.close()
         print(f"[{self.name}] Cerrado.")
 
+    #---Parada de emergencia---
+
+    #M410 (soft: frena el planner) o M112 (hard: mata Marlin, hay que resetear) directo al puerto,
+    #salteando la ventana de "ok". Lo pendiente en la PC se descarta y la macro en curso
+    #termina con Detenido. Devuelve (perf_counter con el byte escrito, lineas descartadas).
+    def estop_soft(self):
+        return self._estop("M410")
+
+    def estop_hard(self):
+        return self._estop("M112")
+
+    def _estop(self, cmd):
+        t_wire, descartadas = self.stream.abortar(cmd)
+        with self._jog_cond:
+            self._jog = {}
+        print(f"[{self.name}] Parada de emergencia ({cmd})")
+        return t_wire, descartadas
+
+    #Antes de cada comando nuevo: si hubo estop, volver a aceptar comandos y resincronizar
+    #la posicion sombra (M410 deja el brazo donde quedo, no donde pediamos)
+    def _rearmar(self):
+        if not self.stream.abortado:
+            return
+        self.stream.rearmar()
+        self.stream.send("M114")
+        self.stream.wait()
+        self.coal = Coalescedor(self.stream.posicion or {k: 0.0 for k in "XYZE"})
+
     #Funcion que lleva el brazo a posicion vertical(90 grados)
     def vertical(self):
-        """Llevar (absoluto) a Z0/E0/X0 y sincronizar."""
+        """Llevar (absoluto) a Z0/E0/X0 en un solo G1 y sincronizar (nada si ya está vertical)."""
         self._send("G90")
-        self._send("G1 Z0 F600")
-        self._send("G1 E0 F600")
-        self._send("G1 X0 F600")
+        self._emitir(self.coal.mover({"Z": 0, "E": 0, "X": 0}, 600))
         self._send("M400")
 
     # Funcion de movimiento relativo en el eje "E"
     def _g1_rel(self, axes: dict, feed: int, pausa=0.0):
-        """Mover en relativo (G91) ejes indicados en un solo G1."""
-        self._send("G91")  # relativo
-        parts = [f"{k}{v}" for k, v in axes.items()]
-        self._send(f"G1 {' '.join(parts)} F{int(feed)}")
-        self._send("M400")
+        """Mover en relativo los ejes indicados; se manda en absoluto usando la posición sombra."""
+        self._emitir(self.coal.mover(axes, int(feed), relativo=True))
         if pausa > 0:
+            self.sync()
             time.sleep(pausa)
-        self._send("G90")  # vuelvo a absoluto
     
     #Genera movimiento en la muñeca 2 (motor paso a paso)
     def _wrist2_suave(self, amp: float, steps: int = 3, feed: int = None):
@@ -137,10 +210,108 @@ class Arm:
 
         self._send("G90")
 
+    #---Jog---
+
+    #Suma el delta a lo que todavia no se mando (recortado a los limites blandos) y vuelve enseguida.
+    #El hilo de jog lo manda como un solo G1 cuando el planner tiene lugar: si llegan muchos
+    #mensajes mientras el brazo se mueve no se arma una cola, se juntan en el proximo movimiento
+    #(hasta JOG_MAX_S de recorrido, asi el brazo frena poco despues de soltar el control).
+    def move_delta(self, axes: dict, feed: int = 1200):
+        """Jog relativo (por ejemplo {"Y": 2, "Z": -1}); no bloquea."""
+        with self._jog_cond:
+            for k, v in (axes or {}).items():
+                k = k.upper()
+                if k not in self.SOFT_LIMITS or v is None:
+                    continue
+                lo, hi = self.SOFT_LIMITS[k]
+                tope = float(feed) / 60.0 * self.JOG_MAX_S   # si el brazo no llega, se pierde el exceso
+                base = self.coal.pos[k] or 0.0
+                delta = min(tope, max(-tope, self._jog.get(k, 0.0) + float(v)))
+                self._jog[k] = min(hi, max(lo, base + delta)) - base
+            self._jog_feed = int(feed)
+            self._jog_cond.notify()
+
+    #Hilo de jog: espera deltas y que a Marlin le queden menos de JOG_COLA_S segundos de movimiento
+    def _jog_loop(self):
+        while True:
+            with self._jog_cond:
+                while self._jog_activo and (not self._jog or self.stream.restante() > self.JOG_COLA_S):
+                    self._jog_cond.wait(self.JOG_POLL_S if self._jog else None)
+                if not self._jog_activo:
+                    return
+            with self._lock:
+                try:
+                    self._rearmar()
+                    with self._jog_cond:
+                        delta, feed, self._jog = self._jog, self._jog_feed, {}
+                        if not delta:
+                            continue
+                        lineas = self.coal.mover(delta, feed, relativo=True) + self.coal.vaciar()
+                    self._emitir(lineas)
+                except Detenido:
+                    pass
+                except Exception as e:
+                    print(f"[{self.name}] Jog: {e}")
+
     # Ejecuta los macros de movimiento
+    # (un jog que llega durante la macro se descarta: queda viejo)
     def run_macro(self, name):
+        with self._lock:
+            with self._jog_cond:
+                self._jog = {}
+            try:
+                self._macro(name)
+            finally:
+                with self._jog_cond:
+                    self._jog = {}
+
+    #Ejecuta un lote (ver lotes.py) como un solo comando: los movimientos van seguidos al
+    #planner sin sincronizar entre ellos. Si un item falla se corta ahi y se informa su indice.
+    def run_batch(self, items):
+        with self._lock:
+            with self._jog_cond:
+                self._jog = {}
+            self._rearmar()
+            t0, est0 = time.time(), self.stream.estimado
+            resultado = {"n": len(items), "hechos": len(items)}
+            for i, it in enumerate(items):
+                try:
+                    tipo = it["type"].lower()
+                    if tipo == "macro":
+                        self.sync()   # las macros arrancan con el brazo quieto
+                        if not self._macro(it["name"]):
+                            raise ValueError(f"macro desconocida: {it['name']}")
+                        continue
+                    relativo = tipo == "move_delta"
+                    self._limites(it["axes"], relativo)
+                    feed = it.get("feed")
+                    self._emitir(self.coal.mover(it["axes"], int(feed) if feed else None, relativo=relativo))
+                except Detenido:
+                    raise
+                except Exception as e:
+                    resultado.update(hechos=i, error={"i": i, "msg": str(e)})
+                    break
+            self.sync()
+            print(f"[LOTE] {resultado['hechos']}/{len(items)} items: estimado "
+                  f"{self.stream.estimado - est0:.2f}s, real {time.time() - t0:.2f}s")
+            return resultado
+
+    #Lanza ValueError si el movimiento sale de los limites blandos
+    def _limites(self, axes, relativo):
+        for k, v in axes.items():
+            k = k.upper()
+            if k not in self.SOFT_LIMITS:
+                continue
+            destino = (self.coal.pos[k] or 0.0) + v if relativo else v
+            lo, hi = self.SOFT_LIMITS[k]
+            if not lo <= destino <= hi:
+                raise ValueError(f"{k}{destino:g} fuera de los limites {lo}..{hi}")
+
+    def _macro(self, name):
         name = (name or "").strip().lower()
         print(f"[MACRO] Ejecutando: {name}")
+        self._rearmar()
+        t0, est0 = time.time(), self.stream.estimado
 
         #Secuencia "servo_test"
         if name == "servo_test":
@@ -246,6 +417,12 @@ class Arm:
             
         else:
             print((f"[ERROR] Macro desconocida: {name}"))
+            return False
+
+        # Esperamos a que termine el ultimo movimiento antes de avisar "Listo"
+        self.sync()
+        print(f"[MACRO] {name}: estimado {self.stream.estimado - est0:.2f}s, real {time.time() - t0:.2f}s")
+        return True
 
 
 
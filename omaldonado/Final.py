@@ -6,23 +6,26 @@
 #Dependiendo el mensaje el brazo inicia una secuencia de movimientos
 
 import json
+import time
 from paho.mqtt.client import Client
 from Brazo import Arm
+from ejecutor import ColaLlena, Ejecutor
+from puente import BAUD, BROKER, BROKER_PORT, NUMERAR, despachar, parar
 
 # ===== CONFIG =====
-PORT = "COM3"                 # Puerto del Mega
-BAUD = 115200                 # Baudios de Marlin
-BROKER = "broker.hivemq.com"  # Broker público (Podes usar otro broker si tenes)
-BROKER_PORT = 1883            # 1883 sin TLS (8883 con TLS)
+PORT = "COM3"                 # Puerto del Mega (baudios, broker y NUMERAR en puente.py)
 
 # Prefijo único para no chocar en broker público
 TOPIC_BASE  = "BrazoOctavio"  
 TOPIC_CMD   = f"{TOPIC_BASE}/cmd"     # recibe casos de comando o JSON
-TOPIC_ESTOP = f"{TOPIC_BASE}/estop"   # {"soft":true} -> M410
+TOPIC_ESTOP = f"{TOPIC_BASE}/estop"   # {"soft":true} -> M410, {"soft":false} -> M112
 TOPIC_STAT  = f"{TOPIC_BASE}/status"  # publica estado
 
 #Crea una instancia de clase Arm, y configura puerto, baudios y nombre
-arm = Arm(PORT, BAUD, name="Brazo1")
+arm = Arm(PORT, BAUD, name="Brazo1", numerar=NUMERAR)
+
+#Cola de comandos + hilo que los ejecuta: el loop de MQTT solo encola y publica
+ejecutor = Ejecutor()
 
 #Se suscribe a los topicos de comando y publica "Listo" como respuesta
 def on_connect(cli, userdata, flags, rc):
@@ -30,37 +33,25 @@ def on_connect(cli, userdata, flags, rc):
     cli.subscribe([(TOPIC_CMD,1),(TOPIC_ESTOP,2)])
     cli.publish(TOPIC_STAT, json.dumps({"state":"Listo"}), retain=False)
 
-#Cuando llega un mensaje Mqtt, interpreta el payload y ejecuta el movimiento indicado, publica "listo" o en su defecto "error" 
+#Cuando llega un mensaje Mqtt, interpreta el payload y lo encola (no ejecuta nada aca: es el hilo de red de paho)
+#El ejecutor publica en status la posicion en cola y el inicio/fin de cada comando
 def on_message(cli, userdata, msg):
     try:
         if msg.topic == TOPIC_ESTOP:
-            arm.estop_soft()
-            cli.publish(TOPIC_STAT, json.dumps({"state":"estopped"}))
+            on_estop(cli, msg)
             return
-
-        payload_raw = msg.payload.decode("utf-8").strip()
-
-        # 1) Si es JSON, usamos type/macro/move_delta
-        try:
-            payload = json.loads(payload_raw)
-            t = (payload.get("type") or "").lower()
-            if t == "move_delta":
-                arm.move_delta(payload.get("axes", {}), payload.get("feed", 1200))
-            elif t == "macro":
-                arm.run_macro(payload.get("name",""))
-            else:
-                # Si viene otro JSON raro, intentá como macro por nombre
-                arm.run_macro(payload_raw)
-        except json.JSONDecodeError:
-            # 2) Si NO es JSON, tratá el texto como nombre de macro directamente
-            arm.run_macro(payload_raw)
-
-        cli.publish(TOPIC_STAT, json.dumps({"state":"Listo"}))
-
+        despachar(arm, ejecutor, msg.payload)
+    except ColaLlena as e:
+        cli.publish(TOPIC_STAT, json.dumps({"state":"rechazado","msg":str(e)}))
     except Exception as e:
         print("[ERR]", e)
         cli.publish(TOPIC_STAT, json.dumps({"state":"error","msg":str(e)}))
 
+def on_estop(cli, msg):
+    t_rx = time.perf_counter()
+    estado = parar(arm, ejecutor, msg.payload.decode("utf-8", "replace"), t_rx)
+    cli.publish(TOPIC_STAT, json.dumps(estado), qos=1)
+
 #Inicia el brazo y el cliente, registra callbacks, se conecta al broker y se queda esperando un mensaje
 def main():
     arm.open()
@@ -70,12 +61,17 @@ def main():
     # cli.tls_set(); BROKER_PORT = 8883
     cli.on_connect = on_connect
     cli.on_message = on_message
+    # Los "Error:" de Marlin se publican en cuanto llegan, sin esperar a que termine la macro
+    arm.on_error = lambda ev: cli.publish(TOPIC_STAT, json.dumps({"state":"error","msg":ev.linea}))
+    ejecutor.on_estado = lambda estado: cli.publish(TOPIC_STAT, json.dumps(estado))
+    ejecutor.start()
     cli.connect(BROKER, BROKER_PORT, 60)
     print(f"[INFO] MQTT en {BROKER}:{BROKER_PORT}")
     print(f"      Topics: cmd={TOPIC_CMD}   estop={TOPIC_ESTOP}   status={TOPIC_STAT}")
     try:
         cli.loop_forever()
     except KeyboardInterrupt:
+        ejecutor.stop()
         arm.estop_soft()
     finally:
         arm.close(reenable_endstops=True, keep_on=True)
@@ -0,0 +1,239 @@
+#Benchmark de latencia MQTT -> movimiento del puente de Final.py, sin broker ni brazo
+
+# Usa el mismo on_message / Ejecutor / Arm de Final.py contra el Marlin emulado
+# (emulador.py) y un "broker" local: una cola y un hilo que entrega los mensajes de a uno,
+# como el hilo de red de paho. Publica comandos a un ritmo fijo (o repite un registro) y
+# mide para cada uno:
+#   espera       publicado -> el ejecutor lo empieza
+#   primer_byte  publicado -> primer byte escrito al serial para ese comando
+#   completo     publicado -> "Listo" (Marlin termino el ultimo movimiento)
+# Resume p50/p95/p99, comandos por minuto, rechazados por cola llena y el largo maximo de
+# la cola. Los tiempos son reales: con --escala < 1 los movimientos duran menos que en el brazo.
+#
+# Uso: python benchmark.py --macros l2,servo_test --ritmo 0.5 -n 40 --csv lat.csv --json lat.json
+#      python benchmark.py --registro comandos.jsonl   (lineas {"t": s, "payload": "..."})
+
+import argparse
+import csv
+import json
+import math
+import queue
+import threading
+import time
+
+import Final
+from emulador import Emulador
+
+# ===== CONFIG =====
+MUESTREO_COLA_S = 0.05   # cada cuanto se mide el largo de la cola del ejecutor
+CAMPOS = ("i", "cmd", "estado", "publicado", "espera_ms", "primer_byte_ms", "completo_ms")
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) por rango mas cercano; None si no hay valores."""
+    if not valores:
+        return None
+    v = sorted(valores)
+    return v[max(0, math.ceil(p / 100.0 * len(v)) - 1)]
+
+
+class _Mensaje:
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+#Broker local: publish() de la app encola y un hilo entrega a on_message de a uno
+class BrokerLocal:
+    def __init__(self, on_message):
+        self.on_message = on_message
+        self.cola = queue.Queue()
+        self.on_status = None
+        self.entregando = None   # indice del mensaje que esta en on_message
+        self._hilo = threading.Thread(target=self._entregar, name="broker", daemon=True)
+        self._hilo.start()
+
+    def _entregar(self):
+        while True:
+            i, msg = self.cola.get()
+            if msg is None:
+                return
+            self.entregando = i
+            self.on_message(self, None, msg)
+            self.entregando = None
+
+    #Lo que el puente publica en status (el mismo cliente hace de los dos lados)
+    def publish(self, topic, payload, qos=0, retain=False):
+        if self.on_status:
+            self.on_status(json.loads(payload))
+
+    def detener(self):
+        self.cola.put((None, None))
+
+
+#Envuelve el serial para saber cuando sale el primer byte de cada comando
+class _Espia:
+    def __init__(self, ser, on_write):
+        self._ser = ser
+        self._on_write = on_write
+
+    def write(self, data):
+        self._on_write(time.perf_counter())
+        return self._ser.write(data)
+
+    def __getattr__(self, nombre):
+        return getattr(self._ser, nombre)
+
+
+class Benchmark:
+    def __init__(self, advanced_ok=True, escala=0.05):
+        self.emu = Emulador(advanced_ok=advanced_ok, escala=escala)
+        self.escala = escala
+        self.filas = {}          # indice -> mensaje publicado
+        self.indice = {}         # id del ejecutor -> indice
+        self.por_id = {}         # id del ejecutor -> tiempos (puede llegar antes que "encolado")
+        self.en_curso = None     # id que esta ejecutando el ejecutor
+        self.cola_max = 0
+        self.muestras_cola = []
+        self.lock = threading.Lock()
+
+    #---Callbacks---
+
+    def _on_status(self, estado):
+        ahora = time.perf_counter()
+        with self.lock:
+            s = estado.get("state")
+            if s == "encolado":
+                self.indice[estado["id"]] = self.broker.entregando
+            elif s == "rechazado":
+                self.filas[self.broker.entregando]["estado"] = "rechazado"
+            elif s == "ejecutando":
+                self.por_id[estado["id"]] = {"inicio": ahora}
+                self.en_curso = estado["id"]
+            elif s in ("Listo", "error") and estado.get("id") in self.por_id:
+                self.por_id[estado["id"]].update(fin=ahora, estado=s)
+                self.en_curso = None
+
+    def _on_write(self, t):
+        with self.lock:
+            if self.en_curso is not None:
+                self.por_id[self.en_curso].setdefault("byte", t)
+
+    def _muestrear_cola(self, fin):
+        t0 = time.perf_counter()
+        while not fin.is_set():
+            n = Final.ejecutor.cola.qsize() + (1 if Final.ejecutor.actual else 0)
+            self.muestras_cola.append((round(time.perf_counter() - t0, 3), n))
+            self.cola_max = max(self.cola_max, n)
+            fin.wait(MUESTREO_COLA_S)
+
+    #---Corrida---
+
+    def correr(self, comandos):
+        """`comandos`: lista de (segundos desde el inicio, payload). Devuelve el resumen."""
+        Final.arm.port = self.emu.iniciar()
+        Final.arm.open()
+        Final.arm.stream.ser = _Espia(Final.arm.stream.ser, self._on_write)
+        Final.arm.stream.verbose = Final.arm.stream.reader.verbose = False   # los print tambien demoran
+        self.broker = BrokerLocal(Final.on_message)
+        self.broker.on_status = self._on_status
+        Final.arm.on_error = lambda ev: self.broker.publish(Final.TOPIC_STAT, json.dumps({"state":"error","msg":ev.linea}))
+        Final.ejecutor.on_estado = lambda estado: self.broker.publish(Final.TOPIC_STAT, json.dumps(estado))
+        Final.ejecutor.start()
+        fin = threading.Event()
+        threading.Thread(target=self._muestrear_cola, args=(fin,), daemon=True).start()
+
+        t0 = time.perf_counter()
+        for i, (t, payload) in enumerate(comandos):
+            espera = t0 + t - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            with self.lock:
+                self.filas[i] = {"cmd": payload, "estado": "perdido", "publicado": time.perf_counter()}
+            self.broker.cola.put((i, _Mensaje(Final.TOPIC_CMD, payload.encode("utf-8"))))
+
+        # Esperamos a que se vacie todo
+        while (Final.ejecutor.cola.qsize() or Final.ejecutor.actual
+               or not self.broker.cola.empty() or self.broker.entregando is not None):
+            time.sleep(0.05)
+        duracion = time.perf_counter() - t0
+        fin.set()
+        self.broker.detener()
+        Final.ejecutor.stop()
+        Final.arm.close()
+        self.emu.detener()
+        return self.resumen(duracion)
+
+    def medidas(self):
+        filas = {i: dict(f) for i, f in self.filas.items()}
+        for cmd_id, tiempos in self.por_id.items():
+            if self.indice.get(cmd_id) in filas:
+                filas[self.indice[cmd_id]].update(tiempos)
+        out = []
+        for i, f in sorted(filas.items()):
+            ms = lambda k: round(1000 * (f[k] - f["publicado"]), 2) if k in f else None
+            out.append({"i": i, "cmd": f["cmd"], "estado": f["estado"], "publicado": round(f["publicado"], 4),
+                        "espera_ms": ms("inicio"), "primer_byte_ms": ms("byte"), "completo_ms": ms("fin")})
+        return out
+
+    def resumen(self, duracion):
+        filas = self.medidas()
+        hechos = [f for f in filas if f["estado"] == "Listo"]
+        res = {"comandos": len(filas), "listos": len(hechos),
+               "rechazados": sum(f["estado"] == "rechazado" for f in filas),
+               "errores": sum(f["estado"] == "error" for f in filas),
+               "duracion_s": round(duracion, 3),
+               "por_minuto": round(60.0 * len(hechos) / duracion, 2) if duracion else 0.0,
+               "cola_max": self.cola_max, "escala": self.escala}
+        for k in ("espera_ms", "primer_byte_ms", "completo_ms"):
+            valores = [f[k] for f in hechos if f[k] is not None]
+            res[k] = {f"p{p}": percentil(valores, p) for p in (50, 95, 99)}
+        return res
+
+
+def sinteticos(macros, ritmo, n):
+    """n comandos a `ritmo` por segundo, rotando entre las macros."""
+    return [(i / ritmo, macros[i % len(macros)]) for i in range(n)]
+
+
+def leer_registro(path):
+    """Lineas JSON {"t": segundos, "payload": str o dict} (por ejemplo grabadas del broker)."""
+    comandos = []
+    with open(path, encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                r = json.loads(linea)
+                p = r["payload"]
+                comandos.append((float(r["t"]), p if isinstance(p, str) else json.dumps(p)))
+    return sorted(comandos, key=lambda c: c[0])
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Latencia MQTT -> movimiento de Final.py")
+    ap.add_argument("--macros", default="servo_test,l2", help="macros separadas por coma")
+    ap.add_argument("--ritmo", type=float, default=1.0, help="comandos por segundo")
+    ap.add_argument("-n", type=int, default=20, help="cantidad de comandos")
+    ap.add_argument("--registro", help="repetir un registro .jsonl en vez de sinteticos")
+    ap.add_argument("--escala", type=float, default=0.05, help="tiempo real / tiempo del brazo")
+    ap.add_argument("--csv", help="medidas por comando")
+    ap.add_argument("--json", help="resumen")
+    args = ap.parse_args()
+
+    if args.registro:
+        comandos = leer_registro(args.registro)
+    else:
+        comandos = sinteticos([m.strip() for m in args.macros.split(",") if m.strip()], args.ritmo, args.n)
+    bench = Benchmark(escala=args.escala)
+    res = bench.correr(comandos)
+    print(json.dumps(res, indent=2))
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=CAMPOS)
+            w.writeheader()
+            w.writerows(bench.medidas())
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"resumen": res, "cola": bench.muestras_cola}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#Estimador de tiempos de movimiento (modelo trapezoidal de Marlin)
+
+# Cada G1 acelera hasta el feed pedido, sigue a velocidad constante y frena; si el
+# recorrido es corto no llega al feed (perfil triangular). Con la aceleracion de M204 y el
+# jerk / junction deviation de M205 sabemos cuanto tarda cada linea y el ciclo completo.
+# Los senders lo usan para poner un plazo a cada "ok" en vez de un timeout fijo.
+#
+# Uso: python cinematica.py ../dsosa/gcodesCompletos.txt
+
+import math
+import sys
+
+from gcode import Coalescedor, parsear_linea
+
+# Valores por defecto de Marlin (Configuration.h) hasta que llegue un M204/M205
+ACCEL_PRINT   = 3000.0   # M204 P: movimientos con E y XYZ
+ACCEL_TRAVEL  = 3000.0   # M204 T: movimientos sin E
+ACCEL_RETRACT = 3000.0   # M204 R: movimientos solo de E
+JERK          = 10.0     # M205 X/Y/Z/E (mm/s): velocidad con la que se arranca/frena
+FEED_INICIAL  = 1200.0   # mm/min si todavia no se mando ningun F
+
+
+def tiempo_trapecio(d, v, a, ve=0.0):
+    """Segundos para recorrer `d` mm a `v` mm/s con aceleracion `a`, entrando y saliendo a `ve`."""
+    if d <= 0 or v <= 0:
+        return 0.0
+    ve = min(ve, v)
+    if a <= 0:
+        return d / v
+    d_acc = (v * v - ve * ve) / (2 * a)
+    if 2 * d_acc <= d:
+        return 2 * (v - ve) / a + (d - 2 * d_acc) / v
+    vp = math.sqrt(a * d + ve * ve)   # no llega a `v`: perfil triangular
+    return 2 * (vp - ve) / a
+
+
+class Estimador:
+    """
+    Sigue el estado modal y la posicion de las lineas que se mandan y devuelve
+    cuanto tarda cada una. `duracion(cmd)` tambien toma los M204/M205.
+    """
+
+    def __init__(self, pos=None):
+        self.coal = Coalescedor(pos or {k: 0.0 for k in "XYZE"})
+        self.accel_print = ACCEL_PRINT
+        self.accel_travel = ACCEL_TRAVEL
+        self.accel_retract = ACCEL_RETRACT
+        self.jerk = JERK
+        self.junction = None   # M205 J: con junction deviation las uniones casi frenan a 0
+
+    def posicionar(self, pos):
+        """Actualiza la posicion (por ejemplo con el reporte de M114)."""
+        self.coal.pos.update({k: float(v) for k, v in pos.items() if k in self.coal.pos})
+
+    def _configurar(self, codigo, params):
+        if codigo == "M204":
+            self.accel_print = params.get("P") or params.get("S") or self.accel_print
+            self.accel_travel = params.get("T") or params.get("S") or self.accel_travel
+            self.accel_retract = params.get("R") or self.accel_retract
+        elif codigo == "M205":
+            jerks = [params[k] for k in "XYZE" if params.get(k) is not None]
+            if jerks:
+                self.jerk = min(jerks)
+            if params.get("J") is not None:
+                self.junction = params["J"]
+
+    def _movimiento(self, antes, despues, feed):
+        dxyz = [(despues[k] or 0.0) - (antes[k] or 0.0) for k in "XYZ"]
+        de = despues["E"] - antes["E"]
+        d = math.sqrt(sum(x * x for x in dxyz))
+        if d > 0:
+            a = self.accel_print if de else self.accel_travel
+        else:
+            d, a = abs(de), self.accel_retract
+        ve = 0.0 if self.junction is not None else self.jerk
+        return tiempo_trapecio(d, (feed or FEED_INICIAL) / 60.0, a, ve)
+
+    def duracion(self, cmd):
+        """Segundos que Marlin tarda en ejecutar la linea (0 para lo que no mueve ni espera)."""
+        codigo, params = parsear_linea(cmd)
+        if codigo in ("M204", "M205"):
+            self._configurar(codigo, params)
+            return 0.0
+        if codigo == "G4":
+            return (params.get("P") or 0.0) / 1000.0 + (params.get("S") or 0.0)
+        if codigo not in ("G0", "G1"):
+            self.coal.agregar(cmd)   # modales (G90/M83/G92...) para interpretar lo que sigue
+            return 0.0
+        antes = dict(self.coal.pos)
+        self.coal.agregar(cmd)
+        self.coal.vaciar()
+        return self._movimiento(antes, self.coal.pos, self.coal.feed)
+
+
+def estimar(lineas, estimador=None):
+    """Devuelve (tiempo total, [tiempo de cada linea]) de un programa."""
+    est = estimador or Estimador()
+    tiempos = [est.duracion(l) for l in lineas]
+    return sum(tiempos), tiempos
+
+
+if __name__ == "__main__":
+    from compilador import compilar, leer_programa
+    for path in sys.argv[1:]:
+        fuente = leer_programa(path)
+        total, tiempos = estimar(fuente)
+        for linea, t in zip(fuente, tiempos):
+            print(f"{t:7.2f}s  {linea}")
+        print(f"; {path}: ciclo estimado {total:.2f} s "
+              f"(compilado {estimar(compilar(fuente))[0]:.2f} s)")
@@ -0,0 +1,94 @@
+#Compilador de programas de G-code
+
+# Toma un programa (lista de lineas o un .txt como dsosa/gcodesCompletos.txt) y lo deja
+# listo para mandar al brazo con menos lineas y menos esperas:
+# 1) Coalescedor (gcode.py): saca modales repetidos (T0, G90, M83...), movimientos que no
+#    mueven nada y junta movimientos seguidos en la misma direccion.
+# 2) Barreras: de los M400 solo quedan los que protegen un M280. El servo se mueve apenas
+#    Marlin lee la linea, sin esperar a los movimientos en cola; el resto (T, G4, M84...)
+#    ya sincroniza solo.
+# 3) El resultado se codifica a bytes una sola vez y queda en cache por hash del fuente.
+#
+# Uso: python compilador.py ../dsosa/gcodesCompletos.txt
+
+import hashlib
+import os
+import sys
+
+from gcode import Coalescedor, parsear_linea
+from marlin import limpiar
+
+VERSION = 1                      # cambiar si cambia la forma de compilar (invalida la cache)
+ACCIONES_INMEDIATAS = ("M280",)  # comandos que Marlin ejecuta sin esperar al planner
+MOVIMIENTOS = ("G0", "G1")
+
+_cache = {}   # hash del fuente -> bytes
+
+
+#Un M400 solo hace falta si antes del proximo movimiento viene una accion inmediata
+def _protege_accion(lineas, desde):
+    for linea in lineas[desde:]:
+        codigo = parsear_linea(linea)[0]
+        if codigo in ACCIONES_INMEDIATAS:
+            return True
+        if codigo in MOVIMIENTOS:
+            return False
+    return False
+
+
+def _barreras(lineas):
+    return [linea for i, linea in enumerate(lineas)
+            if parsear_linea(linea)[0] != "M400" or _protege_accion(lineas, i + 1)]
+
+
+def compilar(lineas):
+    """Devuelve el programa optimizado como lista de lineas (arranca con el preambulo G90/M83)."""
+    coal = Coalescedor()
+    out = coal.preambulo()
+    for linea in lineas:
+        out += coal.agregar(linea)
+    out += coal.vaciar()
+    return _barreras(out)
+
+
+def clave(lineas):
+    """Hash del programa fuente (sin comentarios) y de la version del compilador."""
+    fuente = "\n".join(limpiar(l) for l in lineas if limpiar(l))
+    return hashlib.sha1(f"v{VERSION}\n{fuente}".encode("utf-8")).hexdigest()
+
+
+def compilar_bytes(lineas, cache_dir=None):
+    """
+    Programa compilado y codificado, listo para MarlinStream.send_compilado().
+    Se guarda en memoria y, si se pasa `cache_dir`, tambien en disco.
+    """
+    k = clave(lineas)
+    if k in _cache:
+        return _cache[k]
+    ruta = os.path.join(cache_dir, k + ".gcode") if cache_dir else None
+    if ruta and os.path.exists(ruta):
+        with open(ruta, "rb") as f:
+            buf = f.read()
+    else:
+        buf = "".join(l + "\n" for l in compilar(lineas)).encode("ascii")
+        if ruta:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(ruta, "wb") as f:
+                f.write(buf)
+    _cache[k] = buf
+    return buf
+
+
+def leer_programa(path):
+    """Lee un programa de G-code de un archivo de texto (una linea por comando)."""
+    with open(path, encoding="utf-8") as f:
+        return [l for l in (limpiar(x) for x in f) if l]
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        fuente = leer_programa(path)
+        salida = compilar(fuente)
+        print(f"; {path}: {len(fuente)} lineas -> {len(salida)} lineas")
+        for linea in salida:
+            print(linea)
@@ -0,0 +1,102 @@
+#Cola de comandos con prioridad y un hilo que los ejecuta sobre el brazo
+
+# El callback de MQTT (hilo de red de paho) no puede quedarse esperando una macro de varios
+# segundos: dejaria de mandar keepalives y acks y el broker puede cortar la sesion.
+# Con esto on_message solo encola y publica; el hilo del Ejecutor corre los comandos de a uno.
+
+import itertools
+import queue
+import threading
+import time
+
+COLA_MAX = 16   # comandos esperando como maximo (los que sobran se rechazan)
+
+# Prioridades: menor numero sale primero. Los movimientos sueltos pasan adelante de las
+# macros y lotes largos que esperan; entre iguales se respeta el orden de llegada.
+PRIORIDAD_ALTA   = 0
+PRIORIDAD_NORMAL = 1
+
+
+class ColaLlena(Exception):
+    pass
+
+
+class Ejecutor(threading.Thread):
+    """
+    Ejecuta comandos (funciones sin argumentos) en orden de prioridad y de llegada.
+    (Las paradas de emergencia no pasan por aca: van directo al brazo.)
+    `on_estado(dict)` recibe cada cambio: encolado (con posicion), ejecutando (inicio),
+    listo / error (inicio y fin; listo suma el dict que devuelva el comando).
+    Se llama desde el hilo que encola o desde el ejecutor.
+    """
+
+    def __init__(self, on_estado=None, maxsize: int = COLA_MAX, name: str = "ejecutor"):
+        super().__init__(name=name, daemon=True)
+        self.cola = queue.PriorityQueue(maxsize=maxsize)
+        self.on_estado = on_estado
+        self.actual = None            # id del comando que se esta ejecutando
+        self._seq = itertools.count(1)
+        self._activo = True
+
+    def _avisar(self, **estado):
+        if self.on_estado:
+            self.on_estado(estado)
+
+    def posicion(self, cmd_id):
+        """Lugar en la cola (1 = es el proximo); 0 si se esta ejecutando o ya salio."""
+        with self.cola.mutex:
+            items = sorted(self.cola.queue)
+        for i, item in enumerate(items):
+            if item[1] == cmd_id:
+                return i + 1
+        return 0
+
+    def encolar(self, funcion, nombre: str, prioridad: int = PRIORIDAD_NORMAL):
+        """Encola sin bloquear y devuelve el id. Lanza ColaLlena si no hay lugar."""
+        cmd_id = next(self._seq)
+        try:
+            self.cola.put_nowait((prioridad, cmd_id, nombre, time.time(), funcion))
+        except queue.Full:
+            raise ColaLlena(f"cola llena ({self.cola.maxsize}), se descarta '{nombre}'")
+        self._avisar(state="encolado", id=cmd_id, cmd=nombre,
+                     pos=self.posicion(cmd_id) + (1 if self.actual else 0))
+        return cmd_id
+
+    def run(self):
+        while self._activo:
+            prioridad, cmd_id, nombre, t_llegada, funcion = self.cola.get()
+            if funcion is None:
+                break
+            self.actual = cmd_id
+            inicio = time.time()
+            self._avisar(state="ejecutando", id=cmd_id, cmd=nombre, inicio=inicio,
+                         espera=round(inicio - t_llegada, 3))
+            try:
+                resultado = funcion()
+                # si el comando devuelve un dict (por ejemplo un lote) va en el mismo aviso
+                extra = resultado if isinstance(resultado, dict) else {}
+                self._avisar(state="Listo", id=cmd_id, cmd=nombre, inicio=inicio, fin=time.time(), **extra)
+            except Exception as e:
+                print("[ERR]", e)
+                self._avisar(state="error", id=cmd_id, cmd=nombre, msg=str(e),
+                             inicio=inicio, fin=time.time())
+            finally:
+                self.actual = None
+                self.cola.task_done()
+
+    def stop(self):
+        """Termina despues del comando en curso (descarta lo que quede en cola)."""
+        self._activo = False
+        self.vaciar()
+        self.cola.put((-1, 0, "", 0.0, None))
+
+    def vaciar(self):
+        """Saca todo lo que esta esperando; devuelve cuantos comandos descarto."""
+        n = 0
+        while True:
+            try:
+                self.cola.get_nowait()
+            except queue.Empty:
+                return n
+            self.cola.task_done()
+            n += 1
@@ -0,0 +1,363 @@
+#Emulador de Marlin sobre una pseudo-terminal (pty), para medir sin el brazo
+
+# Crea un puerto (/dev/pts/N) que pyserial abre igual que el Mega y contesta como Marlin:
+# - buffer RX de RX_BUFFER_SIZE bytes (lo que no entra se pierde, como en el Arduino)
+# - cola de BUFSIZE comandos y planner de BLOCK_BUFFER_SIZE movimientos; cada movimiento
+#   tarda lo que calcula cinematica.py con el feed y la aceleracion (M204/M205)
+# - "ok" cuando el comando sale de la cola (ADVANCED_OK opcional: "ok N.. P.. B..")
+# - M400/G4/T/M84 esperan al planner mandando "echo:busy: processing"
+# - lineas numeradas con checksum (Error + Resend), M110, M114, M115
+# - M410/M112 se atienden apenas llegan (EMERGENCY_PARSER); como el quick_stop de Marlin,
+#   M410 descarta la cola y los G0/G1 que llegan durante QUICK_STOP_S
+# Guarda la linea de tiempo de cada comando (llega, ok, arranca, termina) para comparar
+# throughput y tiempo de ciclo entre versiones.
+#
+# Uso (Linux/macOS): python emulador.py --advanced-ok --log linea.csv
+#   y poner el /dev/pts/N que imprime como PORT en Final.py / EjercicioCompletoV2.py
+#   --escala 0.1 corre 10 veces mas rapido (los tiempos del log son siempre los del brazo)
+
+import argparse
+import csv
+import os
+import pty
+import queue
+import select
+import threading
+import time
+import tty
+from collections import deque
+
+from cinematica import Estimador
+from gcode import parsear_linea
+from marlin import BUFSIZE, RX_BUFFER_SIZE, checksum, limpiar
+
+# ===== CONFIG =====
+BLOCK_BUFFER_SIZE = 16   # BLOCK_BUFFER_SIZE de Marlin: movimientos en el planner
+BUSY_S = 2.0             # cada cuanto manda "busy" mientras espera (DEFAULT_KEEPALIVE_INTERVAL)
+SINCRONIZAN = ("M400", "G4", "T0", "T1", "M84", "M18")   # esperan a que el planner se vacie
+QUICK_STOP_S = 1.0       # despues de M410 Marlin descarta los movimientos que llegan por 1 s
+CAMPOS_LOG = ("n", "N", "cmd", "llega", "ok", "inicio", "fin")
+
+
+class Emulador:
+    """
+    Marlin falso en `path`. `iniciar()` arranca los hilos (RX, bucle principal y motores),
+    `detener()` los frena. `filas` es la linea de tiempo (segundos del brazo desde el inicio).
+    """
+
+    def __init__(self, rx_size: int = RX_BUFFER_SIZE, bufsize: int = BUFSIZE,
+                 bloques: int = BLOCK_BUFFER_SIZE, advanced_ok: bool = False,
+                 escala: float = 1.0, verbose: bool = False):
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.path = os.ttyname(self.slave)
+        self.rx_size = rx_size
+        self.bufsize = bufsize
+        self.bloques = bloques
+        self.advanced_ok = advanced_ok
+        self.escala = escala
+        self.verbose = verbose
+
+        self.cond = threading.Condition()
+        self.rx = bytearray()
+        self.tx = queue.Queue()  # respuestas: las escribe _transmitir, fuera del lock
+        self.cola = deque()      # comandos leidos del RX (el primero es el que se ejecuta)
+        self.planner = deque()   # movimientos: (fila, duracion, pos inicial, pos final)
+        self.est = Estimador()
+        self.ultima_n = 0        # ultimo numero de linea aceptado
+        self.filas = []
+        self.perdidos = 0        # bytes que no entraron al RX
+        self.muerto = False      # despues de M112 no contesta mas
+        self._gen = 0            # cambia con M410: el bloque en curso se corta
+        self._descartar_hasta = -1.0   # hasta cuando (segundos del brazo) se tiran los G0/G1
+        self._inicio_bloque = 0.0
+        self._t0 = time.perf_counter()
+        self._activo = False
+        self._hilos = []
+
+    #Segundos del brazo (con --escala 0.1 un segundo real son 10)
+    def _t(self):
+        return (time.perf_counter() - self._t0) / self.escala
+
+    #No escribe al pty: si el host no esta leyendo, os.write bloquearia con el lock tomado
+    #y _leer no podria seguir vaciando el RX
+    def _responder(self, texto):
+        if self.verbose:
+            print(f"{self._t():9.3f} << {texto}")
+        self.tx.put((texto + "\n").encode("ascii"))
+
+    #---Hilos---
+
+    def iniciar(self):
+        self._activo = True
+        self._t0 = time.perf_counter()
+        for f in (self._leer, self._principal, self._motores, self._transmitir):
+            h = threading.Thread(target=f, name=f"emulador{f.__name__}", daemon=True)
+            h.start()
+            self._hilos.append(h)
+        # (pyserial vacia la entrada al abrir: si el puerto se abre despues, esperar_listo
+        # no ve el banner y cae en el M115, como cuando el Mega no se reinicia)
+        self._responder("start")
+        return self.path
+
+    def detener(self):
+        with self.cond:
+            self._activo = False
+            self.cond.notify_all()
+        self.tx.put(None)
+        for h in self._hilos:
+            h.join(timeout=1)
+        os.close(self.master)
+        os.close(self.slave)
+
+    #TX del UART: manda las respuestas en orden
+    def _transmitir(self):
+        while True:
+            data = self.tx.get()
+            if data is None or not self._activo:
+                return
+            try:
+                os.write(self.master, data)
+            except OSError:
+                return
+
+    #Como la interrupcion del UART: guarda lo que entra en el RX y atiende M410/M112 enseguida
+    def _leer(self):
+        while self._activo:
+            if not select.select([self.master], [], [], 0.1)[0]:
+                continue
+            try:
+                data = os.read(self.master, 1024)
+            except OSError:
+                return
+            with self.cond:
+                if b"M112" in data:
+                    self._matar()
+                elif b"M410" in data:
+                    self._frenar()
+                # (llega todo junto: con rafagas grandes se pierde algo mas que en el Mega,
+                # que va vaciando el RX mientras entran los bytes)
+                lugar = self.rx_size - len(self.rx)
+                if len(data) > lugar:
+                    self.perdidos += len(data) - lugar
+                    print(f"[EMU] RX lleno: se pierden {len(data) - lugar} bytes")
+                self.rx += data[:max(0, lugar)]
+                self.cond.notify_all()
+
+    #loop() de Marlin: pasa lineas del RX a la cola y ejecuta de a un comando
+    def _principal(self):
+        while True:
+            with self.cond:
+                self._pasar_a_cola()
+                while self._activo and (not self.cola or self.muerto):
+                    self.cond.wait(0.1)
+                    self._pasar_a_cola()
+                if not self._activo:
+                    return
+                fila = self.cola[0]
+                self._ejecutar(fila)
+                if self.cola and self.cola[0] is fila:   # (M410/M112 pudo vaciar la cola)
+                    self.cola.popleft()
+                if not self.muerto:
+                    fila["ok"] = self._t()
+                    self._ok()
+                self.cond.notify_all()
+
+    #Stepper: ejecuta los bloques del planner en orden, cada uno el tiempo estimado
+    def _motores(self):
+        while True:
+            with self.cond:
+                while self._activo and not self.planner:
+                    self.cond.wait(0.1)
+                if not self._activo:
+                    return
+                fila, dur, _, _ = self.planner[0]
+                gen = self._gen
+                fila["inicio"] = self._t()
+                self._inicio_bloque = time.perf_counter()
+                fin = self._inicio_bloque + dur * self.escala
+                while self._activo and self._gen == gen and time.perf_counter() < fin:
+                    self.cond.wait(fin - time.perf_counter())
+                if self._gen != gen or not self._activo:
+                    continue   # M410 vacio el planner
+                self.planner.popleft()
+                fila["fin"] = self._t()
+                self.cond.notify_all()
+
+    #---Protocolo (todo con el lock tomado)---
+
+    def _ok(self):
+        if self.advanced_ok:
+            self._responder(f"ok N{self.ultima_n} P{self.bloques - len(self.planner)} "
+                            f"B{self.bufsize - len(self.cola)}")
+        else:
+            self._responder("ok")
+
+    def _pedir_reenvio(self, error):
+        self._responder(f"Error:{error}, Last Line: {self.ultima_n}")
+        self._responder(f"Resend: {self.ultima_n + 1}")
+        self._responder("ok")
+
+    def _pasar_a_cola(self):
+        while len(self.cola) < self.bufsize and not self.muerto:
+            fin = self.rx.find(b"\n")
+            if fin < 0:
+                return
+            linea = self.rx[:fin].decode("ascii", "replace").strip()
+            del self.rx[:fin + 1]
+            cmd, n = self._validar(linea)
+            if cmd:
+                self.cola.append({"n": len(self.filas), "N": n, "cmd": cmd, "llega": self._t(),
+                                  "ok": None, "inicio": None, "fin": None})
+                self.filas.append(self.cola[-1])
+
+    #Saca N y checksum; devuelve (comando, N) o (None, None) si hay que pedir reenvio
+    def _validar(self, linea):
+        if not linea.startswith("N"):
+            return limpiar(linea), None
+        cuerpo, asterisco, cs = linea.partition("*")
+        numero, _, cmd = cuerpo.partition(" ")
+        try:
+            n = int(numero[1:])
+        except ValueError:
+            self._pedir_reenvio("Line Number is not Last Line Number+1")
+            return None, None
+        if not asterisco:
+            self._pedir_reenvio("No Checksum with line number")
+            return None, None
+        if not cs.strip().isdigit() or int(cs) != checksum(cuerpo):
+            self._pedir_reenvio("checksum mismatch")
+            return None, None
+        if cmd.startswith("M110"):
+            n = int(parsear_linea(cmd)[1].get("N") or n)
+        elif n != self.ultima_n + 1:
+            self._pedir_reenvio("Line Number is not Last Line Number+1")
+            return None, None
+        self.ultima_n = n
+        return limpiar(cmd), n
+
+    #Espera (mandando "busy") a que los motores terminen todo lo que hay en el planner
+    def _sincronizar(self):
+        busy = time.perf_counter() + BUSY_S * self.escala
+        while self._activo and self.planner:
+            self.cond.wait(max(0.0, busy - time.perf_counter()))
+            if time.perf_counter() >= busy and self.planner:
+                self._responder("echo:busy: processing")
+                busy += BUSY_S * self.escala
+
+    def _ejecutar(self, fila):
+        cmd = fila["cmd"]
+        codigo, params = parsear_linea(cmd)
+        if codigo in SINCRONIZAN:
+            self._sincronizar()
+        fila["inicio"] = self._t()
+        if codigo in ("G0", "G1"):
+            while self._activo and len(self.planner) >= self.bloques:
+                self.cond.wait(0.1)   # planner lleno: Marlin no lee mas el serial
+            antes = dict(self.est.coal.pos)
+            dur = self.est.duracion(cmd)
+            if self._t() < self._descartar_hasta:
+                self.est.posicionar(antes)   # quick_stop: el planner no lo acepta
+                fila["fin"] = fila["inicio"]
+                return
+            if dur > 0:
+                self.planner.append((fila, dur, antes, dict(self.est.coal.pos)))
+                fila["inicio"] = None
+                self.cond.notify_all()
+            else:
+                fila["fin"] = fila["inicio"]
+            return
+        if codigo == "G4":
+            fin = time.perf_counter() + self.est.duracion(cmd) * self.escala
+            while self._activo and time.perf_counter() < fin:
+                self.cond.wait(fin - time.perf_counter())
+        elif codigo == "M114":
+            pos = self.est.coal.pos
+            self._responder(" ".join(f"{k}:{pos[k] or 0.0:.2f}" for k in "XYZE") + " Count X:0 Y:0 Z:0")
+        elif codigo == "M115":
+            self._responder("FIRMWARE_NAME:Marlin (emulador moveo) PROTOCOL_VERSION:1.0 MACHINE_TYPE:Moveo")
+            self._responder(f"Cap:ADVANCED_OK:{int(self.advanced_ok)}")
+            self._responder("Cap:EMERGENCY_PARSER:1")
+        elif codigo in ("M204", "M205", "G90", "G91", "M82", "M83", "G92") or codigo.startswith("T"):
+            self.est.duracion(cmd)
+        elif codigo not in ("M110", "M400", "M410", "M17", "M18", "M84", "M120", "M121", "G21", "M280"):
+            self._responder(f'echo:Unknown command: "{cmd}"')
+        fila["fin"] = self._t()
+
+    #M410: corta el bloque en curso donde esta, descarta el resto del planner y los comandos
+    #que esperaban en la cola (con su "ok", para que el host no los espere) y por QUICK_STOP_S
+    #no acepta movimientos nuevos
+    def _frenar(self):
+        if self.planner:
+            fila, dur, antes, despues = self.planner[0]
+            if fila["inicio"] is not None and dur > 0:
+                f = min(1.0, (time.perf_counter() - self._inicio_bloque) / (dur * self.escala))
+                pos = {k: (antes[k] or 0.0) + ((despues[k] or 0.0) - (antes[k] or 0.0)) * f for k in "XYZE"}
+            else:
+                pos = antes
+            self.est.posicionar(pos)
+            fila["fin"] = self._t()
+        self.planner.clear()
+        self._gen += 1
+        # el primero de la cola es el que se esta ejecutando: termina solo
+        while len(self.cola) > 1:
+            fila = self.cola.pop()
+            fila["ok"] = self._t()
+            if not self.muerto:
+                self._ok()
+        self._descartar_hasta = self._t() + QUICK_STOP_S
+        self.cond.notify_all()
+
+    def _matar(self):
+        self.muerto = True
+        self._frenar()
+        self.cola.clear()
+        self._responder("Error:Printer halted. kill() called!")
+
+    #---Resultados---
+
+    def resumen(self):
+        """Comandos, tiempo de ciclo, tiempo con motores parados entre movimientos, etc."""
+        movs = [f for f in self.filas if f["inicio"] is not None and f["fin"] is not None
+                and parsear_linea(f["cmd"])[0] in ("G0", "G1") and f["fin"] > f["inicio"]]
+        ciclo = max((f["fin"] or f["ok"] or 0.0) for f in self.filas) - self.filas[0]["llega"] if self.filas else 0.0
+        movimiento = sum(f["fin"] - f["inicio"] for f in movs)
+        huecos = sum(max(0.0, b["inicio"] - a["fin"]) for a, b in zip(movs, movs[1:]))
+        return {"comandos": len(self.filas), "movimientos": len(movs), "ciclo_s": round(ciclo, 3),
+                "movimiento_s": round(movimiento, 3), "parado_entre_movimientos_s": round(huecos, 3),
+                "bytes_perdidos": self.perdidos}
+
+    def guardar(self, path):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=CAMPOS_LOG)
+            w.writeheader()
+            for fila in self.filas:
+                w.writerow({k: round(v, 4) if isinstance(v, float) else v for k, v in fila.items()})
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Marlin emulado en una pty")
+    ap.add_argument("--rx", type=int, default=RX_BUFFER_SIZE, help="RX_BUFFER_SIZE (bytes)")
+    ap.add_argument("--bufsize", type=int, default=BUFSIZE, help="BUFSIZE (comandos)")
+    ap.add_argument("--bloques", type=int, default=BLOCK_BUFFER_SIZE, help="BLOCK_BUFFER_SIZE")
+    ap.add_argument("--advanced-ok", action="store_true", help="contestar ok N P B")
+    ap.add_argument("--escala", type=float, default=1.0, help="tiempo real / tiempo del brazo")
+    ap.add_argument("--log", help="CSV con la linea de tiempo al salir")
+    ap.add_argument("-v", "--verbose", action="store_true")
+    args = ap.parse_args()
+
+    emu = Emulador(args.rx, args.bufsize, args.bloques, args.advanced_ok, args.escala, args.verbose)
+    print(f"[EMU] Marlin emulado en {emu.iniciar()}  (Ctrl+C para terminar)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    emu.detener()
+    print("[EMU]", emu.resumen())
+    if args.log:
+        emu.guardar(args.log)
+        print(f"[EMU] Linea de tiempo en {args.log}")
+
+if __name__ == "__main__":
+    main()
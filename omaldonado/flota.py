@@ -0,0 +1,132 @@
+#Programa para manejar varios brazos desde una sola PC con una sola conexion MQTT
+
+# Cada brazo tiene su propio Arm (hilo lector + hilo de jog) y su propio Ejecutor, asi una
+# macro larga en un brazo no frena a los demas: el serial de cada uno va en sus hilos y el
+# cliente MQTT solo reparte por topico.
+#   <TOPIC_BASE>/<topic>/cmd     comandos (igual que en Final.py)
+#   <TOPIC_BASE>/<topic>/estop   parada de emergencia de ese brazo
+#   <TOPIC_BASE>/<topic>/status  estado que publica cada brazo
+#   <TOPIC_BASE>/estop           parada de emergencia de todos
+#
+# Uso: python flota.py [flota.json]
+#   flota.json: [{"port": "COM3", "name": "Brazo1", "topic": "b1"}, ...]
+
+import json
+import sys
+import threading
+import time
+from paho.mqtt.client import Client
+from Brazo import Arm
+from ejecutor import ColaLlena, Ejecutor
+from puente import BAUD, BROKER, BROKER_PORT, NUMERAR, despachar, parar
+
+# ===== CONFIG =====
+TOPIC_BASE = "FlotaMoveo"
+FLOTA = [   # si no se pasa un .json
+    {"port": "COM3", "name": "Brazo1", "topic": "b1"},
+    {"port": "COM4", "name": "Brazo2", "topic": "b2"},
+]
+
+
+class Celda:
+    """Un brazo con su cola de comandos y sus topicos."""
+
+    def __init__(self, cfg, cli):
+        self.topic = cfg.get("topic") or cfg["name"]
+        self.arm = Arm(cfg["port"], cfg.get("baud", BAUD), name=cfg["name"],
+                       numerar=cfg.get("numerar", NUMERAR))
+        self.ejecutor = Ejecutor(name=f"ejecutor-{self.topic}")
+        self.cli = cli
+        self.t_stat = f"{TOPIC_BASE}/{self.topic}/status"
+        self.arm.on_error = lambda ev: self.publicar({"state":"error","msg":ev.linea})
+        self.ejecutor.on_estado = self.publicar
+
+    def publicar(self, estado, qos=0):
+        self.cli.publish(self.t_stat, json.dumps(estado), qos=qos)
+
+    def comando(self, payload):
+        try:
+            despachar(self.arm, self.ejecutor, payload)
+        except ColaLlena as e:
+            self.publicar({"state":"rechazado","msg":str(e)})
+        except Exception as e:
+            print(f"[{self.arm.name}] [ERR]", e)
+            self.publicar({"state":"error","msg":str(e)})
+
+    def estop(self, payload_raw, t_rx):
+        self.publicar(parar(self.arm, self.ejecutor, payload_raw, t_rx), qos=1)
+
+
+def leer_flota(path=None):
+    if not path:
+        return FLOTA
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+#Abre todos los brazos a la vez (cada uno espera su banner de Marlin); los que fallan quedan afuera
+def abrir(celdas):
+    errores = {}
+    def abrir_una(c):
+        try:
+            c.arm.open()
+        except Exception as e:
+            errores[c.topic] = e
+    hilos = [threading.Thread(target=abrir_una, args=(c,)) for c in celdas]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    for topic, e in errores.items():
+        print(f"[ERR] {topic}: no se pudo abrir ({e})")
+    return [c for c in celdas if c.topic not in errores]
+
+
+def main():
+    cli = Client(client_id="flota_pc_bridge", clean_session=True)
+    celdas = abrir([Celda(cfg, cli) for cfg in leer_flota(sys.argv[1] if len(sys.argv) > 1 else None)])
+    if not celdas:
+        return
+    por_topic = {c.topic: c for c in celdas}
+
+    def on_connect(cli, userdata, flags, rc):
+        print(f"[MQTT] Conectado rc={rc}. Brazos: {', '.join(por_topic)}")
+        cli.subscribe([(f"{TOPIC_BASE}/+/cmd",1),(f"{TOPIC_BASE}/+/estop",2),(f"{TOPIC_BASE}/estop",2)])
+        for c in celdas:
+            c.publicar({"state":"Listo"})
+
+    #Solo reparte: el trabajo lo hacen los hilos de cada brazo
+    def on_message(cli, userdata, msg):
+        t_rx = time.perf_counter()
+        partes = msg.topic.split("/")
+        if partes[1:] == ["estop"]:
+            for c in celdas:
+                c.estop(msg.payload.decode("utf-8", "replace"), t_rx)
+            return
+        c = por_topic.get(partes[1]) if len(partes) == 3 else None
+        if c is None:
+            print(f"[MQTT] Topico sin brazo: {msg.topic}")
+        elif partes[2] == "estop":
+            c.estop(msg.payload.decode("utf-8", "replace"), t_rx)
+        elif partes[2] == "cmd":
+            c.comando(msg.payload)
+
+    cli.on_connect = on_connect
+    cli.on_message = on_message
+    for c in celdas:
+        c.ejecutor.start()
+    cli.connect(BROKER, BROKER_PORT, 60)
+    print(f"[INFO] MQTT en {BROKER}:{BROKER_PORT}  base={TOPIC_BASE}")
+    try:
+        cli.loop_forever()
+    except KeyboardInterrupt:
+        for c in celdas:
+            c.ejecutor.stop()
+            c.arm.estop_soft()
+    finally:
+        for c in celdas:
+            c.arm.close(reenable_endstops=True, keep_on=True)
+
+#Si ejecutas este archivo directamente corre el "main()", si lo importas desde otra modulo, no lo ejecuta
+if __name__ == "__main__":
+    main()
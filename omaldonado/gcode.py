@@ -0,0 +1,216 @@
+#Parseo de G-code y "sombra" del estado modal de Marlin
+
+# Guardamos lo que Marlin ya tiene configurado (G90/G91, M82/M83, herramienta, feed y
+# posicion) para no mandar lineas que no cambian nada:
+# - G90/G91/M82/M83 no se mandan: Marlin queda siempre en G90 + M83 y cada movimiento
+#   se traduce a XYZ absolutos y E relativo con la posicion sombra.
+# - T0/T1 solo si cambia la herramienta, F solo si cambia el feed.
+# - Movimientos que no mueven nada se descartan; movimientos seguidos en la misma
+#   direccion y con el mismo feed se juntan en un solo G1 (mismo recorrido).
+# - M400 solo si hubo movimiento desde la ultima barrera (M400/G4).
+#
+# Ojo: M82/M83 fijan E aunque despues venga un G90/G91 (los programas de dsosa mandan
+# "M83" y luego "G90" y sus E suman 0, o sea que en el brazo E sigue relativo).
+# Sin M82/M83, E sigue a G90/G91.
+# Si no se conoce la posicion de X/Y/Z (programa compilado sin brazo), el primer
+# movimiento absoluto de cada eje siempre se manda; uno relativo no se puede traducir y se
+# manda tal cual entre G91 y G90 (el eje sigue desconocido hasta uno absoluto).
+
+import re
+
+from marlin import limpiar
+
+EJES = ("X", "Y", "Z", "E")
+EPS = 1e-6
+
+_PARAM = re.compile(r"([A-Za-z])\s*([-+]?\d*\.?\d*)")
+
+
+def parsear_linea(cmd):
+    """'G1 Z-24 F500 E-27' -> ('G1', {'Z': -24.0, 'F': 500.0, 'E': -27.0}). Sin valor -> None."""
+    cmd = limpiar(cmd)
+    if not cmd:
+        return "", {}
+    codigo, _, resto = cmd.partition(" ")
+    params = {}
+    for letra, valor in _PARAM.findall(resto):
+        try:
+            params[letra.upper()] = float(valor)
+        except ValueError:
+            params[letra.upper()] = None
+    return codigo.upper(), params
+
+
+def fmt(v):
+    """Numero corto para G-code: 12.0 -> '12', -0.50 -> '-0.5'."""
+    s = f"{v:.3f}".rstrip("0").rstrip(".")
+    return "0" if s in ("-0", "") else s
+
+
+#Diferencia entre dos posiciones de un eje (None si alguna es desconocida y cambia)
+def _dif(a, b):
+    if a is None or b is None:
+        return 0.0 if a is b else None
+    return b - a
+
+
+#Dos desplazamientos en la misma direccion y sentido (uno es multiplo positivo del otro)
+def _colineales(d1, d2):
+    ks = []
+    for k in EJES:
+        a, b = d1[k], d2[k]
+        if a is None or b is None:
+            return False
+        if abs(a) < EPS and abs(b) < EPS:
+            continue
+        if abs(a) < EPS or abs(b) < EPS:
+            return False
+        ks.append(b / a)
+    return bool(ks) and min(ks) > 0 and max(ks) - min(ks) < EPS
+
+
+class Coalescedor:
+    """
+    Recibe lineas de G-code (o movimientos ya armados) y devuelve las lineas minimas
+    que hay que mandar. Un movimiento puede quedar pendiente para juntarlo con el
+    siguiente: `vaciar()` lo manda (se llama solo antes de cualquier otro comando).
+    """
+
+    def __init__(self, pos=None):
+        # posicion despues de lo ya aceptado (None: desconocida; E se manda relativo,
+        # asi que su origen da igual y arranca en 0)
+        self.pos = {"X": None, "Y": None, "Z": None, "E": 0.0}
+        if pos:
+            self.pos.update({k: float(v) for k, v in pos.items() if k in EJES})
+        self.absoluto = True     # G90/G91 pedido
+        self.e_modo = None       # True: M83, False: M82, None: sigue a G90/G91
+        self.feed = None         # ultimo F pedido
+        self.tool = None         # herramienta activa en Marlin
+        self._feed_equipo = None
+        self._pend = None        # (inicio, feed) del movimiento todavia sin mandar
+        self._movido = False     # hubo movimiento desde la ultima barrera
+        self.descartadas = 0     # lineas que no hizo falta mandar
+
+    def preambulo(self):
+        """Estado en que queda Marlin para que los movimientos traducidos valgan."""
+        return ["G90", "M83"]
+
+    def _e_relativo(self):
+        return self.e_modo if self.e_modo is not None else not self.absoluto
+
+    #---Movimientos---
+
+    def mover(self, ejes: dict, feed=None, relativo=None):
+        """
+        Acepta un G1. `relativo=None` usa el modo pedido (G90/G91/M83);
+        True/False fuerza relativo/absoluto para todos los ejes.
+        """
+        if feed is not None:
+            self.feed = feed
+        destino = dict(self.pos)
+        ciegos = {}   # relativos en ejes de posicion desconocida
+        for k, v in ejes.items():
+            k = k.upper()
+            if k not in EJES or v is None:
+                continue
+            rel = relativo if relativo is not None else (
+                self._e_relativo() if k == "E" else not self.absoluto)
+            if rel and self.pos[k] is None:
+                if abs(v) >= EPS:
+                    ciegos[k] = float(v)
+                continue
+            destino[k] = round(self.pos[k] + v if rel else float(v), 6)
+        if ciegos:
+            return self._mover_relativo(ciegos, destino)
+
+        delta = {k: _dif(self.pos[k], destino[k]) for k in EJES}
+        if all(d is not None and abs(d) < EPS for d in delta.values()):
+            self.descartadas += 1
+            return []
+
+        if self._pend and self._pend[1] == self.feed:
+            inicio = self._pend[0]
+            previo = {k: _dif(inicio[k], self.pos[k]) for k in EJES}
+            if _colineales(previo, delta):
+                self.pos = destino
+                self.descartadas += 1
+                return []
+
+        out = self.vaciar()
+        self._pend = (dict(self.pos), self.feed)
+        self.pos = destino
+        return out
+
+    #Movimiento con ejes sin posicion conocida: va en G91 y Marlin vuelve a G90
+    #(E no cambia: M83 vale en los dos modos)
+    def _mover_relativo(self, ciegos, destino):
+        out = self.vaciar()
+        partes = []
+        for k in ("X", "Y", "Z"):
+            d = ciegos.get(k, _dif(self.pos[k], destino[k]))
+            if abs(d) >= EPS:
+                partes.append(f"{k}{fmt(d)}")
+        de = destino["E"] - self.pos["E"]
+        if abs(de) >= EPS:
+            partes.append(f"E{fmt(de)}")
+        if self.feed is not None and self.feed != self._feed_equipo:
+            partes.append(f"F{fmt(self.feed)}")
+            self._feed_equipo = self.feed
+        self.pos = destino
+        self._movido = True
+        return out + ["G91", "G1 " + " ".join(partes), "G90"]
+
+    def vaciar(self):
+        """Devuelve el movimiento pendiente (si hay) como un unico G1."""
+        if not self._pend:
+            return []
+        inicio, feed = self._pend
+        self._pend = None
+        partes = [f"{k}{fmt(self.pos[k])}" for k in ("X", "Y", "Z")
+                  if _dif(inicio[k], self.pos[k]) is None or abs(_dif(inicio[k], self.pos[k])) >= EPS]
+        de = self.pos["E"] - inicio["E"]
+        if abs(de) >= EPS:
+            partes.append(f"E{fmt(de)}")
+        if feed is not None and feed != self._feed_equipo:
+            partes.append(f"F{fmt(feed)}")
+            self._feed_equipo = feed
+        self._movido = True
+        return ["G1 " + " ".join(partes)]
+
+    #---Lineas de texto---
+
+    def agregar(self, cmd):
+        """Procesa una linea y devuelve la lista de lineas a mandar ahora."""
+        codigo, params = parsear_linea(cmd)
+        if not codigo:
+            return []
+        if codigo in ("G0", "G1"):
+            return self.mover({k: v for k, v in params.items() if k in EJES}, params.get("F"))
+
+        if codigo in ("G90", "G91"):
+            self.absoluto = codigo == "G90"
+            self.descartadas += 1
+            return []
+        if codigo in ("M82", "M83"):
+            self.e_modo = codigo == "M83"
+            self.descartadas += 1
+            return []
+
+        out = self.vaciar()
+        if codigo.startswith("T"):
+            if codigo == self.tool:
+                self.descartadas += 1
+                return out
+            self.tool = codigo
+        elif codigo == "M400":
+            if not self._movido:
+                self.descartadas += 1
+                return out
+            self._movido = False
+        elif codigo == "G4":
+            self._movido = False   # el dwell de Marlin ya espera al planner
+        elif codigo == "G92":
+            for k, v in params.items():
+                if k in EJES and v is not None:
+                    self.pos[k] = v
+        return out + [limpiar(cmd)]
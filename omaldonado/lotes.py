@@ -0,0 +1,87 @@
+#Lotes de comandos por MQTT (varios movimientos/macros en un solo mensaje)
+
+# JSON: {"type": "batch", "id": "p1", "items": [
+#           {"type": "move", "axes": {"Y": 30, "Z": -10}, "feed": 1200},   absoluto
+#           {"type": "move_delta", "axes": {"X": 5}, "feed": 800},         relativo
+#           {"type": "macro", "name": "servo_test"}]}
+#
+# Binario (para trayectorias largas, sin json.loads por punto):
+#   cabecera  "<2sBBH": b"MV", version, flags (bit 0: relativo), cantidad de puntos
+#   punto     "<4fH"   : X, Y, Z, E (float32, NaN = eje sin mover), feed (mm/min, 0 = el anterior)
+# 18 bytes por punto contra ~50 del JSON. El binario no lleva id: se responde con el de la cola.
+#
+# El puente lo manda entero como un solo comando de la cola y responde una vez al final
+# con cuantos items se hicieron y, si alguno fallo, su indice.
+
+import math
+import struct
+
+MAGIA = b"MV"
+VERSION = 1
+RELATIVO = 0x01
+CABECERA = struct.Struct("<2sBBH")
+PUNTO = struct.Struct("<4fH")
+EJES = ("X", "Y", "Z", "E")
+TIPOS = ("move", "move_delta", "macro")
+ITEMS_MAX = 1000
+
+
+def es_binario(payload: bytes):
+    return payload[:2] == MAGIA
+
+
+def codificar(puntos, relativo=False):
+    """Lista de (ejes dict, feed) -> bytes en el formato binario."""
+    buf = bytearray(CABECERA.pack(MAGIA, VERSION, RELATIVO if relativo else 0, len(puntos)))
+    for ejes, feed in puntos:
+        ejes = {k.upper(): v for k, v in ejes.items()}
+        buf += PUNTO.pack(*(float(ejes.get(k, math.nan)) for k in EJES), int(feed or 0))
+    return bytes(buf)
+
+
+def decodificar_binario(payload: bytes):
+    """Bytes -> items del lote (sin validar)."""
+    magia, version, flags, n = CABECERA.unpack_from(payload)
+    if version != VERSION:
+        raise ValueError(f"lote binario version {version} (se espera {VERSION})")
+    if len(payload) != CABECERA.size + n * PUNTO.size:
+        raise ValueError(f"lote binario de {len(payload)} bytes para {n} puntos")
+    tipo = "move_delta" if flags & RELATIVO else "move"
+    items = []
+    for x, y, z, e, feed in PUNTO.iter_unpack(payload[CABECERA.size:]):
+        ejes = {k: v for k, v in zip(EJES, (x, y, z, e)) if not math.isnan(v)}
+        items.append({"type": tipo, "axes": ejes, "feed": feed or None})
+    return items
+
+
+def validar(items):
+    """Revisa la forma de cada item antes de mandar nada; lanza ValueError con el indice."""
+    if not isinstance(items, list) or not items:
+        raise ValueError("el lote no tiene items")
+    if len(items) > ITEMS_MAX:
+        raise ValueError(f"lote de {len(items)} items (maximo {ITEMS_MAX})")
+    for i, it in enumerate(items):
+        tipo = (it.get("type") or "").lower() if isinstance(it, dict) else None
+        if tipo not in TIPOS:
+            raise ValueError(f"item {i}: tipo invalido")
+        if tipo == "macro":
+            if not it.get("name"):
+                raise ValueError(f"item {i}: macro sin nombre")
+        elif not isinstance(it.get("axes"), dict) or any(
+                k.upper() not in EJES or not _numero(v) for k, v in it["axes"].items()):
+            raise ValueError(f"item {i}: ejes invalidos")
+        elif it.get("feed") is not None and not _numero(it["feed"]):
+            raise ValueError(f"item {i}: feed invalido")
+    return items
+
+
+#Numero finito (el JSON deja pasar true/false, y NaN/Infinity con json.loads)
+def _numero(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v)
+
+
+def decodificar(payload: bytes):
+    """Lote binario -> items validados. Lanza ValueError si no es valido."""
+    if len(payload) < CABECERA.size:
+        raise ValueError("lote binario sin cabecera")
+    return validar(decodificar_binario(payload))
@@ -0,0 +1,536 @@
+#Modulo de comunicacion con Marlin por serial
+
+# En vez de mandar una linea y esperar el "ok" antes de mandar la siguiente (stop-and-wait),
+# mantenemos varias lineas "en vuelo" sin confirmar. Asi el planner de Marlin siempre tiene
+# movimientos en cola y no frena en cada union entre movimientos.
+# Un hilo lector separa lo que contesta Marlin en eventos (ok, busy, error, ...) y los que
+# envian esperan sobre una condicion en vez de quedarse leyendo el puerto en un bucle.
+# Opcionalmente cada linea va numerada y con checksum ("N12 G1 X5*57"): si llega un byte
+# corrupto Marlin pide "Resend:" y la volvemos a mandar, en vez de ejecutar un movimiento
+# equivocado. Con eso se puede subir el baudrate (250000/500000) sin riesgo.
+
+import queue
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+# ===== CONFIG MARLIN =====
+BUFSIZE = 4            # BUFSIZE de Marlin (Configuration_adv.h): comandos en cola
+RX_BUFFER_SIZE = 128   # RX_BUFFER_SIZE de Marlin: bytes que entran en el buffer serial
+TIMEOUT_S = 5.0        # Segundos sin respuesta de Marlin antes de dar una linea por perdida
+FACTOR_PLAZO = 1.5     # Con estimador: plazo = fin estimado del movimiento x factor + margen
+MARGEN_PLAZO_S = 1.0
+EVENTOS_MAX = 256      # Eventos guardados en la cola si nadie los consume
+HISTORIAL = 64         # Lineas numeradas que guardamos para poder reenviarlas
+ESPERA_START_S = 3.0   # Cuanto esperamos el banner "start" despues de abrir el puerto
+ESPERA_M115_S = 2.0    # Cuanto esperamos la respuesta del M115 en cada intento
+INTENTOS_M115 = 3
+
+# ===== EVENTOS =====
+OK     = "ok"       # "ok", "ok N12 P15 B3", "ok T:25.0 /0.0" (datos["temps"])
+BUSY   = "busy"     # "echo:busy: processing" (Marlin ocupado en M400/G4/...)
+RESEND = "resend"   # "Resend: 12" / "rs N12"
+ERROR  = "error"    # "Error:..."
+POS    = "pos"      # "X:0.00 Y:0.00 Z:0.00 E:0.00 Count ..." (M114)
+TEMP   = "temp"     # "T:25.0 /0.0 B:..." (M105 / autoreport)
+START  = "start"    # "start": Marlin se reinicio
+FIRMWARE = "firmware"  # "FIRMWARE_NAME:Marlin ..." (M115)
+ECHO   = "echo"     # "echo:..." (resto de mensajes informativos)
+OTRO   = "otro"
+
+Evento = namedtuple("Evento", "tipo linea datos t")
+
+
+class Detenido(Exception):
+    """Se lanza en quien estaba mandando/esperando cuando se pidio una parada de emergencia."""
+
+
+class SinRespuesta(Exception):
+    """Marlin no contesto el M115 de esperar_listo (puerto equivocado, baudios, placa colgada)."""
+
+
+def limpiar(cmd):
+    """Saca comentarios ';' y espacios de una linea de G-code."""
+    return cmd.split(";", 1)[0].strip()
+
+
+def checksum(texto):
+    """Checksum de Marlin: XOR de todos los bytes de la linea (antes del '*')."""
+    cs = 0
+    for b in texto.encode("ascii"):
+        cs ^= b
+    return cs
+
+
+def numerar(cmd, n):
+    """Arma la linea numerada con checksum: 'N<n> <cmd>*<cs>'."""
+    cuerpo = f"N{n} {cmd}"
+    return f"{cuerpo}*{checksum(cuerpo)}"
+
+
+#Errores de transmision que Marlin resuelve pidiendo Resend (no son errores del programa)
+def _es_error_de_linea(ev):
+    msg = ev.datos.get("msg", "").lower()
+    return "checksum" in msg or "line number" in msg
+
+
+#Convierte "X:1.00 Y:2.00" o "N12 P15 B3" en un diccionario {"X": 1.0, ...}
+def _campos(partes, sep):
+    datos = {}
+    for p in partes:
+        if sep:
+            clave, _, valor = p.partition(sep)
+        else:
+            clave, valor = p[:1], p[1:]
+        try:
+            datos[clave] = float(valor)
+        except ValueError:
+            continue
+    return datos
+
+
+def parsear(linea):
+    """Clasifica una linea de Marlin en un Evento."""
+    t = time.time()
+    baja = linea.lower()
+    if baja.startswith("ok"):
+        partes = linea.split()[1:]
+        if partes and ":" in partes[0]:
+            return Evento(OK, linea, {"temps": _campos(partes, ":")}, t)
+        return Evento(OK, linea, {k: int(v) for k, v in _campos(partes, "").items()}, t)
+    if baja.startswith("echo:busy"):
+        return Evento(BUSY, linea, {}, t)
+    if baja.startswith("resend") or baja.startswith("rs "):
+        numero = "".join(c for c in linea.split(":")[-1].split("N")[-1] if c.isdigit())
+        return Evento(RESEND, linea, {"N": int(numero)} if numero else {}, t)
+    if baja.startswith("error"):
+        return Evento(ERROR, linea, {"msg": linea.partition(":")[2].strip()}, t)
+    if baja.startswith("start"):
+        return Evento(START, linea, {}, t)
+    if baja.startswith("firmware_name"):
+        return Evento(FIRMWARE, linea, {}, t)
+    if baja.startswith("x:"):
+        return Evento(POS, linea, _campos(linea.split(" Count")[0].split(), ":"), t)
+    if baja.startswith("t:") or baja.startswith(" t:"):
+        return Evento(TEMP, linea, _campos(linea.split(), ":"), t)
+    if baja.startswith("echo:"):
+        return Evento(ECHO, linea, {}, t)
+    return Evento(OTRO, linea, {}, t)
+
+
+class MarlinReader(threading.Thread):
+    """
+    Hilo que lee el serial, arma lineas y publica Eventos.
+    - `handlers`: funciones f(evento) que se llaman con `cond` tomado (estado interno).
+    - `eventos`: cola con todos los eventos para quien quiera consumirlos
+      (si se llena se descartan los mas viejos).
+    """
+
+    def __init__(self, ser, verbose: bool = True, maxlen: int = EVENTOS_MAX):
+        super().__init__(name="marlin-lector", daemon=True)
+        self.ser = ser
+        self.verbose = verbose
+        self.eventos = queue.Queue(maxsize=maxlen)
+        self.cond = threading.Condition()
+        self.handlers = []
+        self._activo = True
+        self._resto = b""
+
+    def run(self):
+        while self._activo:
+            try:
+                chunk = self.ser.readline()
+            except (OSError, TypeError, AttributeError):
+                break   # puerto cerrado
+            if not chunk:
+                continue
+            self._resto += chunk
+            if not self._resto.endswith(b"\n"):
+                continue
+            linea, self._resto = self._resto.decode(errors="ignore").strip(), b""
+            if linea:
+                self._publicar(parsear(linea))
+
+    def _publicar(self, ev):
+        if self.verbose:
+            print("<<", ev.linea)
+        with self.cond:
+            for h in self.handlers:
+                h(ev)
+            self.cond.notify_all()
+        while True:
+            try:
+                self.eventos.put_nowait(ev)
+                break
+            except queue.Full:
+                try:
+                    self.eventos.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def stop(self):
+        self._activo = False
+
+
+class MarlinStream:
+    """
+    Envia G-code con ventana deslizante de "ok".
+    - Como maximo `window` lineas sin confirmar y nunca mas bytes que el buffer RX.
+    - Si Marlin tiene ADVANCED_OK ("ok N.. P.. B.."), la ventana se ajusta con los
+      slots libres que informa (B) y guardamos los libres del planner (P).
+    - `on_error(evento)` se llama desde el hilo lector apenas llega un "Error:"
+      (no mandar G-code desde ahi: el lector no podria leer el "ok").
+    - Con `numerar=True` cada linea lleva N y checksum; ante "Resend: k" se reenvia
+      desde k. Las lineas que ya estaban en vuelo siguen en el RX de Marlin y cada una
+      vuelve a contestar "Resend: k" + "ok": esas se cuentan como rechazadas (liberan su
+      lugar en el RX) pero no vuelven a arrancar el reenvio.
+    - El hilo lector nunca escribe, y nadie escribe al puerto con `cond` tomado: las
+      lineas se anotan en vuelo con el lock y se escriben despues, en orden (`_volcar`).
+    - Con un `estimador` (cinematica.Estimador) cada linea tiene su propio plazo segun
+      cuanto falta para que termine el movimiento en cola; sin estimador se usa `timeout`
+      desde la ultima respuesta. Un "busy:" de Marlin tambien estira el plazo.
+    """
+
+    def __init__(self, ser, bufsize: int = BUFSIZE, rx_size: int = RX_BUFFER_SIZE,
+                 timeout: float = TIMEOUT_S, verbose: bool = True, numerar: bool = False,
+                 estimador=None):
+        self.ser = ser
+        self.bufsize = bufsize
+        self.window = bufsize
+        self.rx_size = rx_size
+        self.timeout = timeout
+        self.verbose = verbose
+        self.on_error = None
+
+        self.pendientes = deque()   # lineas enviadas (bytes) esperando su "ok"
+        self.plazos = deque()       # hora limite del "ok" de cada linea en vuelo
+        self.generaciones = deque() # reenvio en curso cuando se escribio cada linea
+        self._salida = deque()      # lineas ya contadas en vuelo que falta escribir
+        self._escritura = threading.Lock()
+        self.bytes_en_vuelo = 0
+        self.planner_libre = None   # P del ultimo ADVANCED_OK
+        self.cola_libre = None      # B del ultimo ADVANCED_OK
+        self.ultimo_error = None
+        self.posicion = None        # ultimo reporte de M114 {"X":.., "Y":.., "Z":.., "E":..}
+        self._t_ultima = time.time()
+        self._t_busy = 0.0
+
+        self.estimador = estimador
+        self.estimado = 0.0         # segundos de movimiento estimados de todo lo enviado
+        self._fin_estimado = 0.0    # hora en que deberia terminar lo que esta en cola
+
+        self.numerar = numerar
+        self.n_linea = 0
+        self.historial = OrderedDict()   # N -> linea ya escrita (bytes)
+        self.reenviar = deque()          # lineas a reescribir despues de un Resend
+        self.reenvios = 0
+        self._gen = 0                    # sube con cada reenvio que arranca
+        self._reenvio_desde = None       # k del ultimo reenvio
+        self._ok_de_resend = False       # el proximo "ok" es de una linea rechazada
+
+        self.reader = MarlinReader(ser, verbose=verbose)
+        self.cond = self.reader.cond
+        self.reader.handlers.append(self._on_evento)
+        self.arrancado = False      # llego el banner "start"
+        self.firmware = None        # linea FIRMWARE_NAME del ultimo M115
+        self.oks = 0                # "ok" recibidos (para saber si una linea se confirmo)
+        self.abortado = False       # parada de emergencia: no se manda nada hasta rearmar()
+        self.reader.start()
+
+    #---Eventos (hilo lector, con el lock tomado)---
+
+    def _on_evento(self, ev):
+        self._t_ultima = ev.t
+        if ev.tipo == START:
+            # Marlin se reinicio: lo que estaba en vuelo se perdio y la numeracion vuelve a 0
+            self.arrancado = True
+            self._vaciar_pendientes()
+            self.reenviar.clear()
+            self._reenvio_desde = None
+            self._ok_de_resend = False
+            self.historial.clear()
+            self.n_linea = 0
+            self._fin_estimado = time.time()
+            return
+        if ev.tipo == ERROR and not (self.numerar and _es_error_de_linea(ev)):
+            self.ultimo_error = ev
+            if self.on_error:
+                self.on_error(ev)
+        if ev.tipo == BUSY:
+            self._t_busy = ev.t
+        if ev.tipo == FIRMWARE:
+            self.firmware = ev.linea
+        if ev.tipo == POS:
+            self.posicion = ev.datos
+            if self.estimador:
+                self.estimador.posicionar(ev.datos)
+        if ev.tipo == RESEND and self.numerar and "N" in ev.datos:
+            self._programar_reenvio(ev.datos["N"])
+        if ev.tipo != OK:
+            return
+        # Cada "ok" corresponde a la linea en vuelo mas vieja (confirmada o, si vino
+        # despues de un Resend, rechazada: en los dos casos ya salio del RX de Marlin)
+        self.oks += 1
+        rechazada, self._ok_de_resend = self._ok_de_resend, False
+        if self.pendientes:
+            if b"M400" in self._sacar_pendiente() and not rechazada and not self.pendientes:
+                self._fin_estimado = min(self._fin_estimado, time.time())   # planner vacio
+        if "P" in ev.datos:
+            self.planner_libre = ev.datos["P"]
+        if "B" in ev.datos:
+            self.cola_libre = ev.datos["B"]
+            self.window = max(1, min(self.bufsize, len(self.pendientes) + self.cola_libre))
+
+    #Marlin rechazo la linea en vuelo mas vieja y pide desde k
+    def _programar_reenvio(self, k):
+        self._ok_de_resend = True
+        vieja = self.generaciones and self.generaciones[0] < self._gen
+        if vieja and k == self._reenvio_desde:
+            return   # ya estaba en vuelo antes del reenvio desde k: la rechaza y nada mas
+        if k not in self.historial:
+            print(f"//// Marlin pidio la linea {k} y ya no esta en el historial")
+            return
+        self.reenvios += 1
+        self._gen += 1
+        self._reenvio_desde = k
+        self.reenviar = deque(data for n, data in self.historial.items() if n >= k)
+
+    def _sacar_pendiente(self):
+        data = self.pendientes.popleft()
+        self.plazos.popleft()
+        self.generaciones.popleft()
+        self.bytes_en_vuelo -= len(data)
+        return data
+
+    def _vaciar_pendientes(self):
+        self.pendientes.clear()
+        self.plazos.clear()
+        self.generaciones.clear()
+        self._salida.clear()
+        self.bytes_en_vuelo = 0
+
+    #Hora limite para el "ok" de la linea mas vieja en vuelo
+    def _limite(self):
+        if self.estimador is None or not self.plazos:
+            return self._t_ultima + self.timeout
+        return max(self.plazos[0], self._t_busy + self.timeout)
+
+    #Espera (sin girar) la proxima respuesta; si se pasa el plazo de la linea mas vieja
+    #la da por perdida. Se llama con el lock tomado.
+    def _esperar_respuesta(self):
+        restante = self._limite() - time.time()
+        if restante > 0:
+            self.cond.wait(restante)
+            return
+        if self.pendientes:
+            perdida = self._sacar_pendiente()
+            print(f"//// Timeout esperando 'ok' de Marlin: {perdida.decode().strip()}")
+        self._t_ultima = time.time()
+
+    #---Envio---
+
+    def _hay_lugar(self, n_bytes):
+        if not self.pendientes:
+            return True
+        return (len(self.pendientes) < self.window
+                and self.bytes_en_vuelo + n_bytes <= self.rx_size)
+
+    #Cuenta una linea como en vuelo y la deja para escribir (con el lock tomado)
+    def _escribir(self, data, duracion=0.0):
+        ahora = time.time()
+        self._fin_estimado = max(self._fin_estimado, ahora) + duracion
+        self.estimado += duracion
+        self._salida.append(data)
+        self.pendientes.append(data)
+        self.plazos.append(ahora + (self._fin_estimado - ahora) * FACTOR_PLAZO + MARGEN_PLAZO_S)
+        self.generaciones.append(self._gen)
+        self.bytes_en_vuelo += len(data)
+
+    #Escribe al puerto lo anotado, en orden y SIN el lock (el lector tiene que poder
+    #seguir leyendo si ser.write tarda)
+    def _volcar(self):
+        with self._escritura:
+            while True:
+                with self.cond:
+                    if not self._salida:
+                        return
+                    data = self._salida.popleft()
+                self.ser.write(data)
+
+    #Igual que _volcar pero desde adentro de un `with self.cond`
+    def _volcar_soltando(self):
+        self.cond.release()
+        try:
+            self._volcar()
+        finally:
+            self.cond.acquire()
+
+    def _duracion(self, cmd):
+        return self.estimador.duracion(cmd) if self.estimador else 0.0
+
+    #Reescribe las lineas pedidas por Resend mientras haya lugar (con el lock tomado)
+    def _bombear(self):
+        while self.reenviar and self._hay_lugar(len(self.reenviar[0])):
+            self._escribir(self.reenviar.popleft())
+
+    def _largo(self, cmd):
+        return len(numerar(cmd, self.n_linea) if self.numerar else cmd) + 1
+
+    #Numera la linea si corresponde (con el lock tomado)
+    def _armar(self, cmd):
+        if not self.numerar:
+            return (cmd + "\n").encode("ascii")
+        n = self.n_linea
+        self.n_linea += 1
+        data = (numerar(cmd, n) + "\n").encode("ascii")
+        self.historial[n] = data
+        while len(self.historial) > HISTORIAL:
+            self.historial.popitem(last=False)
+        return data
+
+    def send(self, cmd):
+        """Encola una linea; solo bloquea si la ventana esta llena."""
+        cmd = limpiar(cmd)
+        if not cmd:
+            return
+        if self.numerar and self.n_linea == 0 and not cmd.startswith("M110"):
+            self.send("M110 N0")   # Marlin arranca a contar desde esta linea
+        with self.cond:
+            self._esperar_lugar(self._largo(cmd))
+            self._escribir(self._armar(cmd), self._duracion(cmd))
+        self._volcar()
+        if self.verbose:
+            print(">>", cmd)
+
+    #Bloquea hasta que entren `n_bytes` mas en la ventana (con el lock tomado)
+    def _esperar_lugar(self, n_bytes):
+        if not self.pendientes:
+            self._t_ultima = time.time()
+        while True:
+            if self.abortado:
+                raise Detenido("parada de emergencia")
+            self._bombear()
+            if not self.reenviar and self._hay_lugar(n_bytes):
+                return
+            if self._salida:
+                self._volcar_soltando()
+                continue
+            self._esperar_respuesta()
+
+    def send_compilado(self, buf: bytes):
+        """Manda un programa ya codificado (lineas ascii con '\n', ver compilador.py)."""
+        for data in buf.splitlines(keepends=True):
+            if self.numerar:
+                self.send(data.decode("ascii"))   # N y checksum se arman al mandar
+                continue
+            with self.cond:
+                self._esperar_lugar(len(data))
+                self._escribir(data, self._duracion(data.decode("ascii")))
+            self._volcar()
+            if self.verbose:
+                print(">>", data.decode("ascii").strip())
+
+    def esperar_listo(self, espera_start: float = ESPERA_START_S,
+                      espera_m115: float = ESPERA_M115_S, intentos: int = INTENTOS_M115):
+        """
+        Espera a que Marlin este listo sin un sleep fijo: vuelve apenas llega el banner
+        "start" (reset por DTR al abrir) y confirma con M115. Si la placa no se reinicio
+        el banner no llega y solo se usa la respuesta del M115. Devuelve los segundos.
+        Cuenta como respuesta el "ok" del M115 o su linea FIRMWARE_NAME; si no llega ninguno
+        en `espera_m115` se reintenta y despues de `intentos` lanza SinRespuesta.
+        """
+        t0 = time.time()
+        with self.cond:
+            while not self.arrancado and time.time() - t0 < espera_start:
+                self.cond.wait(espera_start - (time.time() - t0))
+        for intento in range(1, intentos + 1):
+            with self.cond:
+                self.firmware = None
+            self.send("M115")
+            with self.cond:
+                # el M115 es la ultima linea en vuelo: contesto cuando llegaron todos sus "ok"
+                objetivo = self.oks + len(self.pendientes)
+                contesto = self.cond.wait_for(lambda: self.firmware or self.oks >= objetivo,
+                                              timeout=espera_m115)
+                if contesto:
+                    break
+                # sin respuesta: lo que quedo en vuelo se da por perdido antes de reintentar
+                self._vaciar_pendientes()
+                self.reenviar.clear()
+                self.historial.clear()
+                self.n_linea = 0
+            print(f"//// Marlin no contesto el M115 (intento {intento}/{intentos})")
+        else:
+            raise SinRespuesta(f"Marlin no contesto el M115 en {time.time() - t0:.1f}s")
+        self.wait()
+        return time.time() - t0
+
+    def send_all(self, cmds):
+        for cmd in cmds:
+            self.send(cmd)
+
+    def wait(self):
+        """Espera el "ok" de todas las lineas en vuelo."""
+        with self.cond:
+            while self.pendientes or self.reenviar:
+                if self.abortado:
+                    raise Detenido("parada de emergencia")
+                self._bombear()
+                if self._salida:
+                    self._volcar_soltando()
+                    continue
+                self._esperar_respuesta()
+
+    def restante(self):
+        """Segundos de movimiento estimados que le quedan a Marlin en cola (0 sin estimador)."""
+        return max(0.0, self._fin_estimado - time.time())
+
+    def sync(self):
+        """Manda M400 y espera su "ok": vuelve cuando termino el ultimo movimiento."""
+        self.send("M400")
+        self.wait()
+
+    def abortar(self, cmd="M410"):
+        """
+        Parada de emergencia: escribe `cmd` directo al puerto, sin esperar lugar en la
+        ventana ni numerar (M410/M112 los atiende el EMERGENCY_PARSER de Marlin apenas
+        llegan), descarta los reenvios pendientes y hace fallar a quien este mandando.
+        Devuelve (perf_counter con el byte ya escrito, lineas descartadas).
+        """
+        data = (cmd + "\n").encode("ascii")
+        with self.cond:
+            # lo anotado que todavia no se escribio ya no sale
+            while self._salida:
+                self._salida.pop()
+                self.plazos.pop()
+                self.generaciones.pop()
+                self.bytes_en_vuelo -= len(self.pendientes.pop())
+            if cmd != "M112":
+                # M410 tambien contesta "ok": lo contamos en vuelo
+                self.pendientes.append(data)
+                self.plazos.append(time.time() + self.timeout)
+                self.generaciones.append(self._gen)
+                self.bytes_en_vuelo += len(data)
+            descartadas = len(self.reenviar)
+            self.reenviar.clear()
+            self._fin_estimado = time.time()   # el planner queda vacio
+            self.abortado = True
+            self.cond.notify_all()
+        with self._escritura:   # como mucho espera que termine de salir la linea en curso
+            self.ser.write(data)
+            self.ser.flush()
+            t_wire = time.perf_counter()
+        print(">> (estop)", cmd)
+        return t_wire, descartadas
+
+    def rearmar(self):
+        """Vuelve a aceptar comandos despues de abortar()."""
+        with self.cond:
+            self.abortado = False
+
+    def close(self):
+        """Frena el hilo lector y cierra el puerto."""
+        self.reader.stop()
+        if self.ser and self.ser.is_open:
+            self.ser.close()
+        self.reader.join(timeout=2)
@@ -0,0 +1,61 @@
+#Lo comun a los puentes MQTT -> brazo (Final.py con un brazo, flota.py con varios)
+
+# Solo configuracion y funciones: importarlo no abre puertos ni arranca hilos.
+# Cada puente arma sus propios Arm y Ejecutor y se los pasa a despachar/parar.
+
+import json
+import lotes
+from ejecutor import PRIORIDAD_ALTA, PRIORIDAD_NORMAL
+
+# ===== CONFIG =====
+BAUD = 115200                 # Baudios de Marlin (con NUMERAR se puede subir a 250000/500000)
+NUMERAR = False               # True: cada linea con N y checksum, Marlin pide reenvio si llega corrupta
+BROKER = "broker.hivemq.com"  # Broker público (Podes usar otro broker si tenes)
+BROKER_PORT = 1883            # 1883 sin TLS (8883 con TLS)
+
+#Un lote de un solo movimiento (no macro) es un movimiento suelto: pasa adelante
+def _prioridad(items):
+    suelto = len(items) == 1 and (items[0].get("type") or "").lower() != "macro"
+    return PRIORIDAD_ALTA if suelto else PRIORIDAD_NORMAL
+
+#Interpreta el payload (bytes) de un comando y lo manda al brazo: el jog va directo, las macros
+#y los lotes a la cola del ejecutor de ese brazo
+def despachar(arm, ejecutor, payload):
+    # 0) Lote binario (ver lotes.py)
+    if lotes.es_binario(payload):
+        items = lotes.decodificar(payload)
+        ejecutor.encolar(lambda: arm.run_batch(items), "lote", _prioridad(items))
+        return
+    payload_raw = payload.decode("utf-8").strip()
+    # 1) Si es JSON, usamos type/macro/move_delta/batch
+    try:
+        payload = json.loads(payload_raw)
+        t = (payload.get("type") or "").lower()
+        if t == "batch":
+            items = lotes.validar(payload.get("items"))
+            ejecutor.encolar(lambda: arm.run_batch(items), f"lote {payload.get('id') or ''}".strip(),
+                             _prioridad(items))
+        elif t == "move_delta":
+            # No pasa por la cola: se suma al jog pendiente y el hilo de jog del brazo lo manda
+            arm.move_delta(payload.get("axes", {}), payload.get("feed") or 1200)
+        elif t == "macro":
+            name = payload.get("name","")
+            ejecutor.encolar(lambda: arm.run_macro(name), name)
+        else:
+            # Si viene otro JSON raro, intentá como macro por nombre
+            ejecutor.encolar(lambda: arm.run_macro(payload_raw), payload_raw)
+    except json.JSONDecodeError:
+        # 2) Si NO es JSON, tratá el texto como nombre de macro directamente
+        ejecutor.encolar(lambda: arm.run_macro(payload_raw), payload_raw)
+
+#Parada de emergencia: no pasa por la cola, el M410/M112 va directo al puerto.
+#Despues se descarta lo que estaba esperando y se devuelve el estado con la latencia medida
+def parar(arm, ejecutor, payload_raw, t_rx):
+    try:
+        soft = json.loads(payload_raw or "{}").get("soft", True)
+    except (ValueError, AttributeError):
+        soft = True
+    t_wire, descartadas = arm.estop_soft() if soft else arm.estop_hard()
+    descartadas += ejecutor.vaciar()
+    return {"state":"estopped", "cmd":"M410" if soft else "M112",
+            "latencia_ms":round(1000 * (t_wire - t_rx), 2), "descartados":descartadas}
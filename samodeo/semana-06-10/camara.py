@@ -0,0 +1,80 @@
+#Captura de camara en un hilo aparte: siempre se guarda solo el ultimo frame
+
+# Con cap.read() en el mismo bucle que hands.process la inferencia espera a la camara, y el
+# driver guarda varios frames en su cola, asi que se procesan imagenes viejas. Aca un hilo
+# lee sin parar y se queda solo con el mas nuevo; el bucle de control toma ese frame.
+# Al abrir se pide MJPG, resolucion y FPS fijos y buffer de 1 frame (si el driver lo acepta).
+#
+# Tiene la misma interfaz que cv2.VideoCapture (read, isOpened, get, release), asi que
+# alcanza con cambiar "cv2.VideoCapture(0)" por "Camara(0)".
+
+import threading
+import time
+
+import cv2
+
+# ===== CONFIG CAMARA =====
+ANCHO, ALTO = 640, 480
+FPS = 30
+FOURCC = "MJPG"
+ESPERA_S = 1.0   # cuanto espera read() un frame nuevo antes de dar la camara por perdida
+
+
+class Camara:
+    """
+    `read()` devuelve el frame mas nuevo que todavia no se entrego. Solo espera si el bucle
+    va mas rapido que la camara (no tiene sentido procesar dos veces el mismo frame).
+    """
+
+    def __init__(self, indice=0, ancho=ANCHO, alto=ALTO, fps=FPS, fourcc=FOURCC):
+        self.cap = cv2.VideoCapture(indice)
+        if self.cap.isOpened():
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, ancho)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, alto)
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.cond = threading.Condition()
+        self.frame = None
+        self.n = 0              # frames leidos de la camara
+        self.t = 0.0            # hora del ultimo frame
+        self.perdidos = 0       # frames que nadie llego a usar
+        self._entregado = 0     # ultimo n que devolvio read()
+        self._activo = self.cap.isOpened()
+        self._hilo = threading.Thread(target=self._leer, name="camara", daemon=True)
+        if self._activo:
+            self._hilo.start()
+
+    def _leer(self):
+        while self._activo:
+            ok, frame = self.cap.read()
+            with self.cond:
+                if not ok:
+                    self._activo = False
+                else:
+                    if self.n > self._entregado:
+                        self.perdidos += 1
+                    self.frame, self.n, self.t = frame, self.n + 1, time.time()
+                self.cond.notify_all()
+
+    def read(self, timeout=ESPERA_S):
+        """(ok, frame) como cv2.VideoCapture.read(), pero siempre el ultimo frame."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.n > self._entregado or not self._activo, timeout)
+            if self.n <= self._entregado:
+                return False, None
+            self._entregado = self.n
+            return True, self.frame
+
+    def isOpened(self):
+        return self._activo
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def release(self):
+        with self.cond:
+            self._activo = False
+        if self._hilo.is_alive():
+            self._hilo.join(timeout=ESPERA_S)
+        self.cap.release()
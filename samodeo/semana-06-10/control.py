@@ -0,0 +1,254 @@
+#Logica de decision del control con dos manos (sin camara ni serial)
+
+# Recibe los rasgos de cada mano (ver rasgos.py) y decide que G-code mandar: mano derecha -> Base (Y),
+# Hombro (Z) y pinza; mano izquierda -> Codo (X) / Muñeca (E) con T0 o extrusor con T1, y
+# el gesto de mano cerrada/abierta sostenida para cambiar de tool.
+# Dos modos: "discreto" (un paso de STEP por eje cada DELAY_AXIS) y "continuo" (velocidad
+# proporcional a cuanto se aleja la mano de la zona muerta, todos los ejes en un solo G1).
+# Lo usa v3.py en la etapa de control; no depende de cv2 ni de mediapipe.
+
+import math
+
+from rasgos import MANOS
+
+# =========================
+# PARAMETROS
+# =========================
+LIMITS = {"Y": (-90, 90), "X": (-15, 15), "Z": (0, 40), "E": (-40, 40)}
+FEEDS = {"Y": 1000, "X": 600, "Z": 200, "E": 500}
+STEP = {"Y": 1, "X": 1, "Z": 1, "E": 1}
+DELAY_AXIS = {"Y": 0.10, "X": 0.12, "Z": 0.20, "E": 0.12}
+DEAD_PX = 50
+ALPHA = 0.3
+
+PINZA_THRESH_OPEN, PINZA_THRESH_CLOSE = 0.10, 0.05
+PINZA_DELAY = 0.6
+
+TOOL_HOLD_TIME = 1.0
+TOOL_MSG_DURATION = 2.0
+
+STABILITY_FRAMES = 2
+
+# Modo continuo: a RANGO_PX mas alla de la zona muerta el eje va a FEEDS[eje] (unidades/min).
+# Se manda un segmento cada SEG_MIN_S como minimo, con lo que se movio desde el anterior; el
+# primero de cada movimiento lleva ADELANTO_S de mas, asi en el planner de Marlin siempre hay
+# un segmento esperando y no frena entre uno y otro.
+MODO = "discreto"      # "discreto" | "continuo"
+RANGO_PX = 120
+SEG_MIN_S = 0.05
+SEG_MAX_S = 0.25       # si hubo un hueco largo (frames perdidos) no se manda un salto grande
+ADELANTO_S = 0.10
+FEED_EXTRUSOR = 200
+
+# =========================
+# FUNCIONES
+# =========================
+def ema(prev, new):
+    if prev is None: return new
+    return (1 - ALPHA) * prev + ALPHA * new
+
+def dir_from_offset(offset_px, dead_px):
+    if offset_px > dead_px: return +1
+    elif offset_px < -dead_px: return -1
+    return 0
+
+#Fraccion de la velocidad maxima: 0 en la zona muerta, +-1 a RANGO_PX mas alla
+def prop_from_offset(offset_px, dead_px, rango_px=RANGO_PX):
+    fuera = abs(offset_px) - dead_px
+    if fuera <= 0: return 0.0
+    return math.copysign(min(fuera / rango_px, 1.0), offset_px)
+
+def sim(cmd: str):
+    print("[SIM]", cmd)
+
+
+class Control:
+    """
+    Estado del control (tool activo, pinza, posicion suavizada de cada mano, pose blanda).
+    `procesar(rasgos, now)` toma los Rasgos de las dos manos (rasgos.extraer) y devuelve lo
+    que hay que mostrar; los comandos salen por `enviar(cmd)`.
+    """
+
+    def __init__(self, W, H, enviar=sim, modo=MODO):
+        self.W, self.H = W, H
+        self.CX, self.CY = W // 2, H // 2
+        self.enviar = enviar
+        self.modo = modo
+
+        self.pinza_estado, self.last_pinza_time = None, 0.0
+        self.active_tool = 0
+        self.tool_hold_start = None
+        self.tool_change_msg = ""
+        self.tool_msg_timer = 0.0
+
+        self.hand_stable_count = {"Left": 0, "Right": 0}
+        self.smooth_pos = {"Left": None, "Right": None}
+        self.soft_pose = {"Y": 0.0, "X": 0.0, "Z": 20.0, "E": 0.0}
+        self.last_axis_time = {k: 0.0 for k in ["Y", "X", "Z", "E"]}
+        self.t_segmento = None     # modo continuo: hora del ultimo segmento (None = quieto)
+        self.tool_enviado = None
+
+    def maybe_step(self, axis, direction, now):
+        if direction == 0: return False
+        if (now - self.last_axis_time[axis]) < DELAY_AXIS[axis]: return False
+        new_soft = self.soft_pose[axis] + (STEP[axis] * direction)
+        lo, hi = LIMITS[axis]
+        if not (lo <= new_soft <= hi): return False
+        self.enviar(f"T{self.active_tool}")
+        self.enviar(f"G91\nG1 {axis}{STEP[axis]*direction} F{FEEDS[axis]}\nG90")
+        self.soft_pose[axis] = new_soft
+        self.last_axis_time[axis] = now
+        return True
+
+    def mover_continuo(self, vel, now):
+        """vel: {eje: unidades/s} pedidas en este frame -> un solo G1 relativo con todos los ejes."""
+        vel = {a: v for a, v in vel.items() if v}
+        if not vel:
+            self.t_segmento = None
+            return {}
+        if self.t_segmento is None:
+            dt = SEG_MIN_S + ADELANTO_S
+        elif now - self.t_segmento < SEG_MIN_S:
+            return {}
+        else:
+            dt = min(now - self.t_segmento, SEG_MAX_S)
+        self.t_segmento = now
+
+        deltas = {}
+        for a, v in vel.items():
+            if a == "E" and self.active_tool == 1:
+                if round(v * dt, 3):
+                    deltas[a] = round(v * dt, 3)   # extrusor: sin limites
+                continue
+            lo, hi = LIMITS[a]
+            d = round(min(max(self.soft_pose[a] + v * dt, lo), hi) - self.soft_pose[a], 3)
+            if d:
+                deltas[a] = d
+                self.soft_pose[a] = round(self.soft_pose[a] + d, 3)
+        if not deltas:
+            return {}
+        # como Marlin (y cinematica.Estimador): F es la velocidad de XYZ; E solo la marca
+        # cuando el segmento no mueve ningun otro eje
+        xyz = [vel[a] for a in deltas if a != "E"] or [vel["E"]]
+        feed = max(1, round(60 * math.hypot(*xyz)))
+        if self.tool_enviado != self.active_tool:
+            self.enviar(f"T{self.active_tool}")
+            self.tool_enviado = self.active_tool
+        ejes = " ".join(f"{a}{deltas[a]:g}" for a in "XYZE" if a in deltas)
+        self.enviar(f"G91\nG1 {ejes} F{feed}\nG90")
+        return deltas
+
+    def procesar(self, rasgos, now):
+        """Decide con las manos de un frame. Devuelve un dict con lo que dibuja la vista."""
+        W, H, CX, CY = self.W, self.H, self.CX, self.CY
+        status_L, status_R, dibujar = [], [], []
+        continuo = self.modo == "continuo"
+        vel = {}
+
+        if self.tool_change_msg and not (now - self.tool_msg_timer < TOOL_MSG_DURATION):
+            self.tool_change_msg = ""
+
+        # Confirmar estabilidad
+        for i, h in enumerate(MANOS):
+            if rasgos.presente[i]:
+                self.hand_stable_count[h] += 1
+            else:
+                self.hand_stable_count[h] = 0
+
+        # Procesar manos
+        for i, h in enumerate(MANOS):
+            if self.hand_stable_count[h] < STABILITY_FRAMES:
+                continue
+
+            x, y = int(rasgos.muneca[i, 0] * W), int(rasgos.muneca[i, 1] * H)
+            prev = self.smooth_pos[h]
+            self.smooth_pos[h] = (ema(prev[0] if prev else None, x),
+                                  ema(prev[1] if prev else None, y)) if prev else (x, y)
+            sx, sy = self.smooth_pos[h]
+            dibujar.append((h, (int(sx), int(sy))))
+
+            # ---------- MANO DERECHA ----------
+            if h == "Right":
+                offset_x, offset_y = sx - (CX + W//4), CY - sy
+                dirY, dirZ = dir_from_offset(offset_x, DEAD_PX), dir_from_offset(offset_y, DEAD_PX)
+                if continuo:
+                    vel["Y"] = prop_from_offset(offset_x, DEAD_PX) * FEEDS["Y"] / 60
+                    vel["Z"] = prop_from_offset(offset_y, DEAD_PX) * FEEDS["Z"] / 60
+                else:
+                    if self.maybe_step("Y", dirY, now):
+                        status_R.append("➡️ Base der" if dirY > 0 else "⬅️ Base izq")
+                    if self.maybe_step("Z", dirZ, now):
+                        status_R.append("⬆️ Hombro arriba" if dirZ > 0 else "⬇️ Hombro abajo")
+
+                # Pinza
+                dist = rasgos.pinza[i]
+                if (now - self.last_pinza_time) > PINZA_DELAY:
+                    if self.pinza_estado != "cerrada" and dist < PINZA_THRESH_CLOSE:
+                        self.enviar("M280 P2 S180")
+                        self.pinza_estado, self.last_pinza_time = "cerrada", now
+                        status_R.append("✊ Pinza CERRADA")
+                    elif self.pinza_estado != "abierta" and dist > PINZA_THRESH_OPEN:
+                        self.enviar("M280 P2 S90")
+                        self.pinza_estado, self.last_pinza_time = "abierta", now
+                        status_R.append("🖐 Pinza ABIERTA")
+
+            # ---------- MANO IZQUIERDA ----------
+            elif h == "Left":
+                offset_x, offset_y = sx - (W//4), CY - sy
+                dirX, dirE = dir_from_offset(offset_x, DEAD_PX), dir_from_offset(offset_y, DEAD_PX)
+
+                if continuo:
+                    if self.active_tool == 0:
+                        vel["X"] = prop_from_offset(offset_x, DEAD_PX) * FEEDS["X"] / 60
+                        vel["E"] = prop_from_offset(offset_y, DEAD_PX) * FEEDS["E"] / 60
+                    else:
+                        vel["E"] = prop_from_offset(offset_y, DEAD_PX) * FEED_EXTRUSOR / 60
+
+                elif self.active_tool == 0:
+                    # Control normal del brazo
+                    if self.maybe_step("X", dirX, now):
+                        status_L.append("➡️ Codo +X" if dirX > 0 else "⬅️ Codo -X")
+                    if self.maybe_step("E", dirE, now):
+                        status_L.append("⬆️ Muñeca +E" if dirE > 0 else "⬇️ Muñeca -E")
+
+                elif self.active_tool == 1:
+                    # Control del extrusor T1
+                    if dirE != 0 and (now - self.last_axis_time["E"]) > 0.2:
+                        self.enviar("T1")
+                        self.enviar(f"G91\nG1 E{dirE*2} F200\nG90")
+                        self.last_axis_time["E"] = now
+                        status_L.append("🌀 Extrusor +E" if dirE > 0 else "🌀 Extrusor -E")
+
+                # Gesto cambio Tool
+                if rasgos.cerrada[i]:
+                    if self.tool_hold_start is None:
+                        self.tool_hold_start = now
+                    elif now - self.tool_hold_start > TOOL_HOLD_TIME and self.active_tool == 0:
+                        self.active_tool = 1
+                        self.enviar("T1")
+                        self.tool_change_msg = "Cambio realizado: Tool T1"
+                        self.tool_msg_timer = now
+                        self.tool_hold_start = None
+                elif rasgos.abierta[i]:
+                    if self.tool_hold_start is None:
+                        self.tool_hold_start = now
+                    elif now - self.tool_hold_start > TOOL_HOLD_TIME and self.active_tool == 1:
+                        self.active_tool = 0
+                        self.enviar("T0")
+                        self.tool_change_msg = "Cambio realizado: Tool T0"
+                        self.tool_msg_timer = now
+                        self.tool_hold_start = None
+                else:
+                    self.tool_hold_start = None
+
+        if continuo:
+            # Un solo G1 con los ejes de las dos manos
+            self.mover_continuo(vel, now)
+            nombres = {"Y": "Base", "Z": "Hombro", "X": "Codo",
+                       "E": "Extrusor" if self.active_tool == 1 else "Muñeca"}
+            for a, v in vel.items():
+                if v: (status_R if a in "YZ" else status_L).append(f"{nombres[a]} {v:+.1f}/s")
+
+        return {"status_L": status_L, "status_R": status_R, "dibujar": dibujar,
+                "modo": self.modo, "active_tool": self.active_tool, "pinza_estado": self.pinza_estado,
+                "tool_change_msg": self.tool_change_msg}
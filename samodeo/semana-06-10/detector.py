@@ -0,0 +1,110 @@
+#Deteccion de manos con MediaPipe sobre una imagen reducida y recortes alrededor de cada mano
+
+# hands.process sobre el frame entero (640x480) es lo que mas tarda en las PCs de la celda
+# (solo CPU). Una vez encontradas las manos, ya sabemos mas o menos donde van a estar en el
+# proximo frame: se procesa solo un recorte cuadrado alrededor de cada una (reducido a
+# LADO_ROI) con un Hands por mano, y las coordenadas se pasan de vuelta al frame.
+# Si una mano se pierde, o cada BUSQUEDA_CADA frames mientras falte alguna, se busca en el
+# frame entero reducido a ESCALA. Lo que devuelve es lo mismo que antes: los landmarks
+# normalizados al frame, asi que el control no cambia.
+
+import cv2
+
+# ===== CONFIG =====
+ESCALA = 0.5          # busqueda en el frame entero: fraccion del tamaño original
+LADO_ROI = 192        # px del recorte que se le pasa a MediaPipe
+MARGEN = 1.8          # lado del recorte / lado mayor de la mano
+LADO_MIN = 0.25       # lado minimo del recorte (fraccion del alto del frame)
+BUSQUEDA_CADA = 15    # frames entre busquedas completas si falta una mano
+MANOS = ("Left", "Right")
+
+
+def _reducir(img, escala):
+    if escala >= 1.0:
+        return img
+    return cv2.resize(img, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+
+
+class DetectorManos:
+    """
+    `detectar(rgb)` -> {"Left": lmset|None, "Right": lmset|None} con coordenadas del frame.
+    `crear_hands(max_num_hands, model_complexity)` arma cada mp.solutions.hands.Hands.
+    """
+
+    def __init__(self, crear_hands, escala=ESCALA, usar_roi=True, complejidad=1):
+        self.crear_hands = crear_hands
+        self.escala = escala
+        self.usar_roi = usar_roi
+        self.complejidad = complejidad
+        self._crear()
+        self.cajas = {h: None for h in MANOS}   # (x0, y0, lado) del proximo recorte en px
+        self.busquedas = 0                       # veces que se proceso el frame entero
+        self._frames = 0
+
+    def _crear(self):
+        self.completo = self.crear_hands(2, self.complejidad)
+        self.por_mano = {h: self.crear_hands(1, self.complejidad) for h in MANOS} if self.usar_roi else {}
+
+    def reconfigurar(self, escala=None, complejidad=None):
+        """Cambia la escala y/o el model_complexity (este ultimo rearma los Hands)."""
+        if escala is not None:
+            self.escala = escala
+        if complejidad is not None and complejidad != self.complejidad:
+            for hands in [self.completo] + list(self.por_mano.values()):
+                hands.close()
+            self.complejidad = complejidad
+            self._crear()
+            self.cajas = {h: None for h in MANOS}
+
+    #Caja cuadrada alrededor de los landmarks (en px), dentro del frame
+    def _caja(self, lmset, W, H):
+        xs = [lm.x * W for lm in lmset.landmark]
+        ys = [lm.y * H for lm in lmset.landmark]
+        lado = max(max(xs) - min(xs), max(ys) - min(ys)) * MARGEN
+        lado = int(min(max(lado, LADO_MIN * H), W, H))
+        cx, cy = (max(xs) + min(xs)) / 2, (max(ys) + min(ys)) / 2
+        x0 = int(min(max(cx - lado / 2, 0), W - lado))
+        y0 = int(min(max(cy - lado / 2, 0), H - lado))
+        return x0, y0, lado
+
+    def _completo(self, rgb):
+        self.busquedas += 1
+        results = self.completo.process(_reducir(rgb, self.escala))
+        manos = {h: None for h in MANOS}
+        if results.multi_hand_landmarks:
+            for i, lmset in enumerate(results.multi_hand_landmarks):
+                manos[results.multi_handedness[i].classification[0].label] = lmset
+        return manos
+
+    def _recorte(self, rgb, h, caja):
+        H, W = rgb.shape[:2]
+        x0, y0, lado = caja
+        crop = rgb[y0:y0 + lado, x0:x0 + lado]
+        results = self.por_mano[h].process(_reducir(crop, LADO_ROI / lado))
+        if not results.multi_hand_landmarks:
+            return None
+        if results.multi_handedness[0].classification[0].label != h:
+            return None   # en el recorte quedo la otra mano
+        lmset = results.multi_hand_landmarks[0]
+        for lm in lmset.landmark:
+            lm.x = (x0 + lm.x * lado) / W
+            lm.y = (y0 + lm.y * lado) / H
+            lm.z = lm.z * lado / W
+        return lmset
+
+    def detectar(self, rgb):
+        H, W = rgb.shape[:2]
+        self._frames += 1
+        seguidas = [h for h in MANOS if self.cajas[h] is not None]
+        buscar = (not self.usar_roi or not seguidas
+                  or (len(seguidas) < len(MANOS) and self._frames % BUSQUEDA_CADA == 0))
+        if buscar:
+            manos = self._completo(rgb)
+        else:
+            manos = {h: self._recorte(rgb, h, self.cajas[h]) if self.cajas[h] else None for h in MANOS}
+            if any(manos[h] is None for h in seguidas):
+                # se perdio una mano: buscamos en el frame entero en este mismo frame
+                manos = self._completo(rgb)
+        for h in MANOS:
+            self.cajas[h] = self._caja(manos[h], W, H) if (manos[h] is not None and self.usar_roi) else None
+        return manos
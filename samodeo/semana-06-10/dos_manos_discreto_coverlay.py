@@ -3,6 +3,7 @@ import mediapipe as mp
 import serial
 import time
 import math
+from camara import Camara
 
 # =========================
 # CONFIG SERIAL
@@ -32,7 +33,7 @@ hands = mp_hands.Hands(
 # =========================
 # CAMARA
 # =========================
-cap = cv2.VideoCapture(0)
+cap = Camara(0)
 if not cap.isOpened():
     raise RuntimeError("No se pudo abrir la cámara.")
 
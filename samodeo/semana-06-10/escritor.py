@@ -0,0 +1,195 @@
+#Escritura al serial que espera los "ok" de Marlin y no junta atraso
+
+# Marlin contesta "ok" por cada linea que entra a su cola. Si se escribe sin leer, cuando la
+# mano va mas rapido que el brazo se llena el buffer de recepcion de Marlin (o el del sistema
+# y ser.write se queda bloqueado en el bucle de video). Aca un hilo escribe solo mientras
+# haya menos de EN_VUELO lineas sin "ok" y otro lee las respuestas.
+# Lo que espera su turno es una cola corta de bloques. Un jog nuevo ("G91 / G1 ... / G90")
+# se suma al jog que todavia no salio (un solo G1 con los dos desplazamientos), asi lo que
+# se mueve sigue a la mano y no a una lista de pasos viejos. El F del G1 sumado se elige para
+# que ningun eje vaya mas rapido que lo que pidio su jog (Y a F1000 + Z a F200 no mueve Z a
+# 700 mm/min); un jog sin F solo se suma con otro sin F. Si la cola esta llena y no hay
+# con que sumarlo, el jog se descarta. Pinza, tool y cualquier otro comando nunca se
+# descartan; un "Tn" igual al tool que ya quedo activo no se repite.
+
+import math
+import re
+import threading
+import time
+from collections import deque
+
+# ===== CONFIG =====
+EN_VUELO = 4          # lineas sin "ok" (BUFSIZE de Marlin)
+COLA_MAX = 8          # bloques esperando para salir
+ACK_TIMEOUT_S = 3.0   # sin "ok" por este tiempo se da por perdido y se sigue
+
+_G1 = re.compile(r"([A-Z])(-?\d+(?:\.\d*)?)")
+
+
+def leer_jog(cmd):
+    """"G91\\nG1 Y1 Z-2 F1000\\nG90" -> ({"Y": 1.0, "Z": -2.0}, 1000.0); None si no es un jog."""
+    lineas = cmd.strip().split("\n")
+    if len(lineas) != 3 or lineas[0] != "G91" or lineas[2] != "G90":
+        return None
+    partes = lineas[1].split()
+    if not partes or partes[0] != "G1":
+        return None
+    ejes, feed = {}, None
+    for p in partes[1:]:
+        m = _G1.fullmatch(p)
+        if not m:
+            return None
+        if m.group(1) == "F":
+            feed = float(m.group(2))
+        else:
+            ejes[m.group(1)] = float(m.group(2))
+    return ejes, feed
+
+
+def _largo(ejes):
+    """Largo del recorrido al que Marlin le aplica F: XYZ, o E si no se mueve otro eje."""
+    xyz = [d for a, d in ejes.items() if a != "E" and d]
+    return math.hypot(*xyz) if xyz else abs(ejes.get("E", 0.0))
+
+
+def velocidades(ejes, feed):
+    """Velocidad de cada eje (mm/min) en un G1 con F=feed; None si no lleva F."""
+    largo = _largo(ejes)
+    if feed is None or not largo:
+        return None
+    return {a: feed * abs(d) / largo for a, d in ejes.items()}
+
+
+def sumar_jog(ejes, vel, jog):
+    """
+    Suma `jog` (ejes, feed) al jog (ejes, vel) que espera en cola; devuelve (ejes, vel, feed)
+    o None si no se pueden sumar. El F sale del eje que mas tarda a su velocidad pedida.
+    """
+    nuevos, feed = jog
+    vel_nuevo = velocidades(nuevos, feed)
+    if (vel is None) != (vel_nuevo is None):
+        return None
+    ejes = dict(ejes)
+    for a, d in nuevos.items():
+        ejes[a] = ejes.get(a, 0.0) + d
+    if vel is None:
+        return ejes, None, None
+    vel = {a: max(vel.get(a, 0.0), vel_nuevo.get(a, 0.0)) for a in ejes}
+    tiempo = max((abs(d) / vel[a] for a, d in ejes.items() if d and vel[a]), default=0.0)
+    largo = _largo(ejes)
+    feed = max(1, round(largo / tiempo)) if tiempo and largo else max(vel.values())
+    return ejes, vel, feed
+
+
+def armar_jog(ejes, feed):
+    g1 = " ".join(f"{a}{round(d, 3):g}" for a, d in ejes.items())
+    return f"G91\nG1 {g1}" + (f" F{feed:g}" if feed else "") + "\nG90"
+
+
+class Escritor:
+    """
+    `enviar(cmd)` no bloquea nunca; cmd puede tener varias lineas (se mandan juntas).
+    Sin serial (ser=None) imprime "[SIM] ..." como antes. `cerrar()` al salir.
+    """
+
+    def __init__(self, ser, en_vuelo=EN_VUELO, cola_max=COLA_MAX):
+        self.ser = ser
+        self.en_vuelo_max = en_vuelo
+        self.cola = deque()            # [lineas, jog|None]; jog = (ejes, vel) mientras se pueda sumar
+        self.cola_max = cola_max
+        self.cond = threading.Condition()
+        self.en_vuelo = 0
+        self.t_ok = time.time()
+        self.tool = None               # tool activo despues de todo lo encolado
+        self.sumados = 0
+        self.descartados = 0
+        self.activo = True
+        self.hilos = [threading.Thread(target=self._escribir, name="serial-tx", daemon=True)]
+        if ser:
+            self.hilos.append(threading.Thread(target=self._leer, name="serial-rx", daemon=True))
+        for h in self.hilos:
+            h.start()
+
+    def enviar(self, cmd):
+        cmd = cmd.strip()
+        with self.cond:
+            if re.fullmatch(r"T\d+", cmd):
+                if cmd == self.tool:
+                    return
+                self.tool = cmd
+            jog = leer_jog(cmd)
+            suma = sumar_jog(*self.cola[-1][1], jog) if jog and self.cola and self.cola[-1][1] else None
+            if suma:
+                ejes, vel, feed = suma
+                self.cola[-1] = [armar_jog(ejes, feed).split("\n"), (ejes, vel)]
+                self.sumados += 1
+                return
+            if jog and len(self.cola) >= self.cola_max:
+                self.descartados += 1
+                print(f"[SERIAL] Cola llena, jog descartado: {cmd.splitlines()[1]}")
+                return
+            if jog:
+                jog = (jog[0], velocidades(*jog))
+            self.cola.append([cmd.split("\n"), jog])
+            self.cond.notify_all()
+
+    def _escribir(self):
+        while True:
+            with self.cond:
+                while self.activo and not (self.cola and self._hay_lugar()):
+                    self.cond.wait(0.1)
+                if not self.activo:
+                    return
+                lineas = self.cola[0][0]
+                linea = lineas.pop(0)
+                self.cola[0][1] = None          # ya empezo a salir: no se le suma nada
+                if not lineas:
+                    self.cola.popleft()
+                if self.en_vuelo == 0:
+                    self.t_ok = time.time()
+                self.en_vuelo += 1
+            if self.ser:
+                try: self.ser.write((linea + "\n").encode())
+                except Exception as e: print(f"[SERIAL] Error al escribir: {e}")
+            else:
+                print("[SIM]", linea)
+                self._ok()
+
+    def _hay_lugar(self):
+        if self.en_vuelo < self.en_vuelo_max:
+            return True
+        if time.time() - self.t_ok > ACK_TIMEOUT_S:
+            print(f"[SERIAL] Sin 'ok' hace {ACK_TIMEOUT_S}s, se sigue enviando")
+            self.en_vuelo = 0
+            return True
+        return False
+
+    def _ok(self):
+        with self.cond:
+            self.en_vuelo = max(0, self.en_vuelo - 1)
+            self.t_ok = time.time()
+            self.cond.notify_all()
+
+    def _leer(self):
+        while self.activo:
+            try:
+                linea = self.ser.readline().decode(errors="replace").strip()
+            except Exception:
+                if not self.activo: return
+                time.sleep(0.1)
+                continue
+            if linea.startswith("ok"):
+                self._ok()
+            elif linea.startswith("Error") or linea.startswith("!!"):
+                print(f"[SERIAL] {linea}")
+
+    def cerrar(self, espera_s=1.0):
+        """Espera (hasta espera_s) a que salga lo encolado y frena los hilos."""
+        fin = time.time() + espera_s
+        while self.cola and time.time() < fin:
+            time.sleep(0.01)
+        with self.cond:
+            self.activo = False
+            self.cond.notify_all()
+        for h in self.hilos:
+            h.join(timeout=1)
@@ -0,0 +1,56 @@
+#Colas entre las etapas del bucle de vision (captura -> inferencia -> control -> vista)
+
+# Cada etapa corre en su hilo y le pasa a la siguiente lo que produjo por una cola corta.
+# Si la siguiente va mas lenta, se descarta lo mas viejo: un imshow lento o una escritura
+# al serial nunca frenan la proxima inferencia, y siempre se trabaja con el frame mas nuevo.
+
+import threading
+from collections import deque
+
+
+class ColaUltimos:
+    """Cola acotada que nunca bloquea al que pone: si esta llena descarta el elemento mas viejo."""
+
+    def __init__(self, maxlen: int = 2):
+        self.items = deque(maxlen=maxlen)
+        self.cond = threading.Condition()
+        self.descartados = 0
+        self.cerrada = False
+
+    def put(self, item):
+        with self.cond:
+            if len(self.items) == self.items.maxlen:
+                self.descartados += 1
+            self.items.append(item)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """Saca el mas viejo que quede; None si se cerro o paso el timeout."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.items or self.cerrada, timeout)
+            return self.items.popleft() if self.items else None
+
+    def cerrar(self):
+        with self.cond:
+            self.cerrada = True
+            self.cond.notify_all()
+
+
+def etapa(nombre, funcion, entrada, salida=None):
+    """
+    Hilo que toma de `entrada`, llama `funcion(item)` y pone el resultado en `salida`.
+    Termina cuando se cierra la entrada (y cierra la salida para que termine la siguiente).
+    """
+    def correr():
+        while True:
+            item = entrada.get()
+            if item is None:
+                break
+            resultado = funcion(item)
+            if salida is not None and resultado is not None:
+                salida.put(resultado)
+        if salida is not None:
+            salida.cerrar()
+    hilo = threading.Thread(target=correr, name=nombre, daemon=True)
+    hilo.start()
+    return hilo
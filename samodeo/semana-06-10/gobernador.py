@@ -0,0 +1,71 @@
+#Gobernador de calidad: baja o sube el costo de la inferencia segun los FPS que se logran
+
+# Mide cuanto tarda la etapa de inferencia por frame contra el presupuesto 1/FPS_OBJETIVO
+# (con inferencia cada N frames, lo que tarda una inferencia dividido N).
+# Si se pasa varios frames seguidos baja un nivel (modelo mas liviano, imagen mas chica,
+# sin dibujar landmarks, inferencia cada N frames); si sobra tiempo por un rato largo sube.
+# Subir tarda mas que bajar para no quedar saltando entre dos niveles.
+
+# ===== CONFIG =====
+FPS_OBJETIVO = 20
+BAJAR_TRAS = 10       # mediciones seguidas pasadas de presupuesto para bajar un nivel
+SUBIR_TRAS = 90       # mediciones seguidas holgadas para subir uno
+HOLGURA = 0.6         # "holgado": menos de este porcentaje del presupuesto
+ALPHA = 0.2           # suavizado del tiempo por frame
+
+# Del mejor al mas barato. complejidad: model_complexity de MediaPipe, escala: tamaño de la
+# busqueda en el frame entero, landmarks: dibujarlos en la vista, cada: inferir 1 de cada N frames
+NIVELES = [
+    {"complejidad": 1, "escala": 0.75, "landmarks": True,  "cada": 1},
+    {"complejidad": 1, "escala": 0.5,  "landmarks": True,  "cada": 1},
+    {"complejidad": 0, "escala": 0.5,  "landmarks": True,  "cada": 1},
+    {"complejidad": 0, "escala": 0.4,  "landmarks": False, "cada": 1},
+    {"complejidad": 0, "escala": 0.4,  "landmarks": False, "cada": 2},
+]
+
+
+class Gobernador:
+    """
+    `medir(segundos por frame)` despues de cada inferencia; devuelve el nivel nuevo (dict) si cambio.
+    `nivel` es el indice actual y `actual` su configuracion.
+    """
+
+    def __init__(self, fps_objetivo=FPS_OBJETIVO, niveles=NIVELES, nivel=1):
+        self.presupuesto = 1.0 / fps_objetivo
+        self.niveles = niveles
+        self.nivel = nivel
+        self.t_frame = None      # segundos por frame (suavizado)
+        self._pasados = 0
+        self._holgados = 0
+
+    @property
+    def actual(self):
+        return self.niveles[self.nivel]
+
+    def medir(self, dt):
+        self.t_frame = dt if self.t_frame is None else (1 - ALPHA) * self.t_frame + ALPHA * dt
+        if self.t_frame > self.presupuesto:
+            self._pasados, self._holgados = self._pasados + 1, 0
+        elif self.t_frame < self.presupuesto * HOLGURA:
+            self._pasados, self._holgados = 0, self._holgados + 1
+        else:
+            self._pasados = self._holgados = 0
+
+        if self._pasados >= BAJAR_TRAS and self.nivel < len(self.niveles) - 1:
+            return self._cambiar(self.nivel + 1)
+        if self._holgados >= SUBIR_TRAS and self.nivel > 0:
+            return self._cambiar(self.nivel - 1)
+        return None
+
+    def _cambiar(self, nivel):
+        self.nivel = nivel
+        self.t_frame = None
+        self._pasados = self._holgados = 0
+        print(f"[GOB] Nivel {nivel}: {self.actual}")
+        return self.actual
+
+    def texto(self):
+        n = self.actual
+        ms = f"{1000 * self.t_frame:.0f}ms" if self.t_frame is not None else "-"
+        return (f"Nivel {self.nivel}/{len(self.niveles) - 1}  c{n['complejidad']} "
+                f"x{n['escala']} 1/{n['cada']}  {ms}")
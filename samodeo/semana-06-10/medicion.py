@@ -0,0 +1,78 @@
+#Tiempos de cada etapa del bucle de vision, frame por frame
+
+# Cada frame recibe un numero al salir de la camara y cada etapa anota cuanto tardo
+# (perf_counter_ns) en una fila de un array fijo de N frames que se va pisando (buffer
+# circular), asi no se pide memoria en el bucle y cuesta un par de microsegundos por etapa.
+# "total" es desde que se empezo a leer la camara hasta que el frame se mostro.
+# Los frames que se descartaron entre etapas quedan con -1 en las que no llegaron.
+
+import time
+
+import numpy as np
+
+# ===== CONFIG =====
+N = 2048             # frames guardados
+VENTANA = 120        # frames que se usan para FPS y percentiles
+ETAPAS = ["captura", "inferencia", "control", "dibujo", "vista", "total"]
+
+
+class Medidor:
+    """
+    `k = nuevo()` al empezar un frame, `anotar(k, etapa, t0_ns)` al terminar cada etapa.
+    `texto()` da las lineas para la vista y `guardar(csv)` escribe todo lo guardado.
+    """
+
+    def __init__(self, etapas=ETAPAS, n=N):
+        self.etapas = list(etapas)
+        self.col = {e: i for i, e in enumerate(self.etapas)}
+        self.n = n
+        self.t = np.zeros(n, dtype=np.int64)                          # inicio de cada frame
+        self.dur = np.full((n, len(self.etapas)), -1, dtype=np.int64)  # ns por etapa
+        self.k = 0
+
+    def nuevo(self):
+        self.k += 1
+        fila = self.k % self.n
+        self.dur[fila] = -1
+        self.t[fila] = time.perf_counter_ns()
+        return self.k
+
+    def anotar(self, k, etapa, t0_ns):
+        self.dur[k % self.n, self.col[etapa]] = time.perf_counter_ns() - t0_ns
+
+    def anotar_total(self, k):
+        self.dur[k % self.n, self.col["total"]] = time.perf_counter_ns() - self.t[k % self.n]
+
+    def _ultimas(self, cuantas):
+        """Indices de las ultimas `cuantas` filas, de la mas vieja a la mas nueva."""
+        cuantas = min(cuantas, self.k, self.n)
+        return np.arange(self.k - cuantas + 1, self.k + 1) % self.n
+
+    def resumen(self, ventana=VENTANA):
+        """{etapa: (fps, p50_ms, p99_ms)} de las ultimas `ventana` filas."""
+        filas = self._ultimas(ventana)
+        if len(filas) < 2:
+            return {}
+        lapso = (self.t[filas[-1]] - self.t[filas[0]]) / 1e9
+        dur = self.dur[filas]
+        res = {}
+        for e, i in self.col.items():
+            validos = dur[:, i][dur[:, i] >= 0]
+            if len(validos):
+                p50, p99 = np.percentile(validos, [50, 99]) / 1e6
+                res[e] = (len(validos) / lapso if lapso > 0 else 0.0, p50, p99)
+        return res
+
+    def texto(self):
+        return [f"{e:<10} {fps:5.1f}fps  p50 {p50:5.1f}ms  p99 {p99:5.1f}ms"
+                for e, (fps, p50, p99) in self.resumen().items()]
+
+    def guardar(self, path):
+        filas = self._ultimas(self.n)
+        with open(path, "w") as f:
+            f.write("frame,t_ms," + ",".join(f"{e}_ms" for e in self.etapas) + "\n")
+            t0 = self.t[filas[0]] if len(filas) else 0
+            for k, fila in zip(range(self.k - len(filas) + 1, self.k + 1), filas):
+                dur = ",".join(f"{d / 1e6:.3f}" if d >= 0 else "" for d in self.dur[fila])
+                f.write(f"{k},{(self.t[fila] - t0) / 1e6:.3f},{dur}\n")
+        print(f"[MEDICION] {len(filas)} frames guardados en {path}")
@@ -0,0 +1,99 @@
+#Vista previa MJPEG por HTTP para correr sin ventana
+
+# En modo sin ventana (v3.py --sin-ventana) no hay imshow; para mirar lo que ve el control
+# se abre http://127.0.0.1:PUERTO/ en el navegador. La vista solo deja la referencia al
+# ultimo frame (no copia ni codifica nada); el JPEG lo arma el hilo del servidor, como
+# mucho FPS veces por segundo y una sola vez por frame aunque haya varios mirando.
+# Si nadie mira no se codifica nada.
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+# ===== CONFIG =====
+HOST = "127.0.0.1"    # solo local; para verla desde otra PC mejor un tunel ssh
+FPS = 5
+CALIDAD = 60          # calidad JPEG (0-100)
+LIMITE = "frame"
+
+
+class Preview:
+    """`publicar(frame)` desde la vista; `mirando()` dice si hay alguien conectado."""
+
+    def __init__(self, puerto, fps=FPS, calidad=CALIDAD, host=HOST):
+        self.periodo = 1.0 / fps
+        self.calidad = calidad
+        self.cond = threading.Condition()
+        self.frame, self.n = None, 0
+        self._jpeg, self._n_jpeg = None, 0
+        self._codificando = threading.Lock()
+        self.clientes = 0
+        preview = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/":
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={LIMITE}")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                preview._conectar(+1)
+                try:
+                    preview._servir(self.wfile)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    preview._conectar(-1)
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer((host, puerto), Manejador)
+        self.servidor.daemon_threads = True
+        self.hilo = threading.Thread(target=self.servidor.serve_forever, name="preview", daemon=True)
+        self.hilo.start()
+        print(f"[PREVIEW] http://{host}:{puerto}/ ({fps} fps, calidad {calidad})")
+
+    def mirando(self):
+        return self.clientes > 0
+
+    def publicar(self, frame):
+        with self.cond:
+            self.frame, self.n = frame, self.n + 1
+            self.cond.notify_all()
+
+    def _conectar(self, d):
+        with self.cond:
+            self.clientes += d
+
+    def _jpeg_nuevo(self, visto):
+        """Espera un frame posterior a `visto` y devuelve (n, jpeg); lo codifica una sola vez."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.n > visto, timeout=1.0)
+            if self.n <= visto:
+                return visto, None
+            n, frame = self.n, self.frame
+        # se codifica fuera de self.cond para no frenar a publicar()
+        with self._codificando:
+            if self._n_jpeg != n:
+                ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.calidad])
+                self._jpeg, self._n_jpeg = (buf.tobytes() if ok else None), n
+            return self._n_jpeg, self._jpeg
+
+    def _servir(self, salida):
+        visto = 0
+        while True:
+            t0 = time.monotonic()
+            visto, jpeg = self._jpeg_nuevo(visto)
+            if jpeg:
+                salida.write(f"--{LIMITE}\r\nContent-Type: image/jpeg\r\n"
+                             f"Content-Length: {len(jpeg)}\r\n\r\n".encode() + jpeg + b"\r\n")
+            time.sleep(max(0.0, self.periodo - (time.monotonic() - t0)))
+
+    def cerrar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
@@ -0,0 +1,44 @@
+#Rasgos de las manos de un frame, calculados de una sola vez con NumPy
+
+# Los 21 landmarks de cada mano se copian una vez a un array (2 manos x 21 x 3, NaN si la
+# mano no esta) y de ahi salen todos los rasgos que usa el control, para las dos manos a la
+# vez: posicion de la muñeca, distancia pulgar-indice (pinza) y que dedos estan estirados.
+# El control no vuelve a leer los protobuf de MediaPipe.
+
+from collections import namedtuple
+
+import numpy as np
+
+MANOS = ("Left", "Right")
+PUNTAS = [8, 12, 16, 20]   # indice, medio, anular, meñique
+PIP = [6, 10, 14, 18]      # articulacion de cada uno (punta arriba de la articulacion = estirado)
+
+# presente (2,) bool, puntos (2,21,3), muneca (2,2) x/y normalizados, pinza (2,),
+# extendidos (2,4) bool, abierta / cerrada (2,) bool. El indice de cada mano es MANOS.index(h)
+Rasgos = namedtuple("Rasgos", "presente puntos muneca pinza extendidos abierta cerrada")
+
+
+def a_array(lmset):
+    """NormalizedLandmarkList -> array (21, 3) con x, y, z."""
+    return np.fromiter((v for lm in lmset.landmark for v in (lm.x, lm.y, lm.z)),
+                       dtype=np.float32, count=63).reshape(21, 3)
+
+
+def extraer(manos):
+    """{"Left": lmset|None, "Right": lmset|None} -> Rasgos de las dos manos."""
+    puntos = np.full((len(MANOS), 21, 3), np.nan, dtype=np.float32)
+    for i, h in enumerate(MANOS):
+        if manos.get(h) is not None:
+            puntos[i] = a_array(manos[h])
+    return desde_puntos(puntos)
+
+
+def desde_puntos(puntos):
+    """Rasgos a partir del array (2, 21, 3) (tambien para sesiones grabadas)."""
+    presente = ~np.isnan(puntos[:, 0, 0])
+    pinza = np.linalg.norm(puntos[:, 8, :2] - puntos[:, 4, :2], axis=1)
+    with np.errstate(invalid="ignore"):
+        extendidos = puntos[:, PUNTAS, 1] < puntos[:, PIP, 1]
+    n = extendidos.sum(axis=1)
+    return Rasgos(presente, puntos, puntos[:, 0, :2], pinza, extendidos,
+                  presente & (n >= 3), presente & (n == 0))
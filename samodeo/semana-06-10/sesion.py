@@ -0,0 +1,133 @@
+#Grabacion de sesiones del control con manos y reproduccion sin camara
+
+# v3.py graba cada frame (hora + landmarks de las dos manos, y si se pide la imagen) en un
+# archivo de sesion. Despues se reproduce sin camara ni ventana, lo mas rapido posible, por
+# el mismo Control (maybe_step, pinza, gesto de tool) y sale el G-code que hubiera mandado:
+#   python sesion.py sesion.mvs -o salida.gcode
+# Dos versiones del control se comparan con diff de las salidas. Con --detectar se vuelve a
+# correr MediaPipe sobre las imagenes grabadas (para medir el detector).
+#
+# Formato: cabecera CABECERA (b"MVSS", version, W, H, con_frames) y despues un registro
+# REGISTRO por frame. Las imagenes van aparte en <ruta>.frames (H*W*3 bytes BGR por frame).
+# Los dos se leen con np.memmap, sin cargarlos enteros en memoria.
+
+import argparse
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+import rasgos
+from control import MODO, Control
+
+CABECERA = "<4sHHHH"
+MAGIA = b"MVSS"
+VERSION = 1
+REGISTRO = np.dtype([("t", "<f8"), ("puntos", "<f4", (len(rasgos.MANOS), 21, 3))])
+
+
+class Grabador:
+    """`agregar(t, puntos, frame)` por cada frame; `cerrar()` al final."""
+
+    def __init__(self, ruta, W, H, con_frames=False):
+        self.ruta = ruta
+        self.n = 0
+        self.f = open(ruta, "wb")
+        self.f.write(struct.pack(CABECERA, MAGIA, VERSION, W, H, int(con_frames)))
+        self.f_frames = open(ruta + ".frames", "wb") if con_frames else None
+        self._reg = np.zeros(1, dtype=REGISTRO)
+
+    def agregar(self, t, puntos, frame=None):
+        self._reg["t"], self._reg["puntos"] = t, puntos
+        self.f.write(self._reg.tobytes())
+        if self.f_frames is not None and frame is not None:
+            self.f_frames.write(np.ascontiguousarray(frame, dtype=np.uint8).tobytes())
+        self.n += 1
+
+    def cerrar(self):
+        self.f.close()
+        if self.f_frames is not None:
+            self.f_frames.close()
+        print(f"[SESION] {self.n} frames grabados en {self.ruta}")
+
+
+def abrir(ruta):
+    """-> (W, H, registros, frames|None), todos como memmap de solo lectura."""
+    with open(ruta, "rb") as f:
+        magia, version, W, H, con_frames = struct.unpack(CABECERA, f.read(struct.calcsize(CABECERA)))
+    if magia != MAGIA or version != VERSION:
+        raise ValueError(f"{ruta}: no es una sesion v{VERSION}")
+    registros = _mapear(ruta, REGISTRO, struct.calcsize(CABECERA))
+    frames = _mapear(ruta + ".frames", np.dtype((np.uint8, (H, W, 3)))) if con_frames else None
+    return W, H, registros, frames
+
+
+#Un registro cortado al final (se corto la grabacion) se ignora
+def _mapear(ruta, dtype, offset=0):
+    n = (os.path.getsize(ruta) - offset) // dtype.itemsize
+    if n <= 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(ruta, dtype=dtype, mode="r", offset=offset, shape=(n,))
+
+
+def reproducir(ruta, detector=None, modo=None):
+    """
+    Pasa la sesion por un Control nuevo con las horas grabadas. Devuelve [(t, cmd), ...].
+    Con `detector` (DetectorManos) los landmarks salen de las imagenes y no del registro.
+    """
+    W, H, registros, frames = abrir(ruta)
+    if detector is not None and frames is None:
+        raise ValueError(f"{ruta}: la sesion no tiene imagenes")
+    salida = []
+    t = 0.0
+    ctrl = Control(W, H, enviar=lambda cmd: salida.append((t, cmd)), modo=modo or MODO)
+    for i, reg in enumerate(registros):
+        t = float(reg["t"])
+        if detector is not None:
+            r = rasgos.extraer(detector.detectar(np.ascontiguousarray(frames[i][:, :, ::-1])))
+        else:
+            r = rasgos.desde_puntos(reg["puntos"])
+        ctrl.procesar(r, t)
+    return salida
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Reproduce una sesion grabada y escribe el G-code.")
+    ap.add_argument("sesion")
+    ap.add_argument("-o", "--salida", help="archivo de G-code (por defecto se imprime)")
+    ap.add_argument("--tiempos", action="store_true", help="agregar la hora de cada comando")
+    ap.add_argument("--modo", choices=["discreto", "continuo"], help=f"modo del control (por defecto {MODO})")
+    ap.add_argument("--detectar", action="store_true", help="volver a detectar sobre las imagenes")
+    args = ap.parse_args()
+
+    detector = None
+    if args.detectar:
+        from detector import DetectorManos
+        from v3 import crear_hands
+        detector = DetectorManos(crear_hands)
+
+    registros = abrir(args.sesion)[2]
+    n, inicio = len(registros), (float(registros[0]["t"]) if len(registros) else 0.0)
+    t0 = time.perf_counter()
+    comandos = reproducir(args.sesion, detector, args.modo)
+    dt = time.perf_counter() - t0
+
+    lineas = []
+    for t, cmd in comandos:
+        if args.tiempos:
+            lineas.append(f"; t={t - inicio:.3f}")
+        lineas.extend(cmd.split("\n"))
+    texto = "\n".join(lineas) + "\n" if lineas else ""
+    if args.salida:
+        with open(args.salida, "w") as f:
+            f.write(texto)
+    else:
+        print(texto, end="")
+    print(f"[SESION] {n} frames en {dt:.3f}s ({n / dt if dt else 0:.0f} frames/s), "
+          f"{len(comandos)} comandos", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import mediapipe as mp
 import serial
 import time
 import math
+from camara import Camara
 
 # =========================
 # CONFIG SERIAL
@@ -28,7 +29,7 @@ hands = mp_hands.Hands(max_num_hands=2, min_detection_confidence=0.7, min_tracki
 # =========================
 # CAMARA
 # =========================
-cap = cv2.VideoCapture(0)
+cap = Camara(0)
 if not cap.isOpened():
     raise RuntimeError("No se pudo abrir la cámara.")
 W = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
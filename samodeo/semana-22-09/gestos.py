@@ -2,6 +2,11 @@ import cv2
 import mediapipe as mp
 import serial
 import time
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "semana-06-10"))
+from camara import Camara
+from escritor import Escritor
 
 # -------------------------
 # CONFIGURACIÓN SERIAL
@@ -18,6 +23,9 @@ except:
     print("Error: No se pudo conectar al puerto serial")
     ser = None
 
+# Escritura que espera los "ok" de Marlin y suma los jogs atrasados (ver semana-06-10/escritor.py)
+serie = Escritor(ser) if ser else None
+
 # -------------------------
 # CONFIGURACIÓN MEDIAPIPE HANDS
 # -------------------------
@@ -28,7 +36,7 @@ hands = mp_hands.Hands(max_num_hands=1, min_detection_confidence=0.7, min_tracki
 # -------------------------
 # INICIO CÁMARA
 # -------------------------
-cap = cv2.VideoCapture(0)
+cap = Camara(0)
 
 # -------------------------
 # DELAYS
@@ -71,21 +79,21 @@ while cap.isOpened():
                 if x < center_x - 50:
                     cv2.putText(frame, "BASE IZQUIERDA", (50,50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0,0,255), 2)
                     if ser:
-                        ser.write(b"G91\nG1 Y-5 F400\nG90\n")
+                        serie.enviar("G91\nG1 Y-5 F400\nG90")
                 elif x > center_x + 50:
                     cv2.putText(frame, "BASE DERECHA", (50,50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0,255,0), 2)
                     if ser:
-                        ser.write(b"G91\nG1 Y5 F400\nG90\n")
+                        serie.enviar("G91\nG1 Y5 F400\nG90")
 
                 # Hombro
                 if y < center_y - 50:
                     cv2.putText(frame, "HOMBRO ARRIBA", (50,100), cv2.FONT_HERSHEY_SIMPLEX, 1, (255,0,0), 2)
                     if ser:
-                        ser.write(b"G91\nG1 Z5 F300\nG90\n")
+                        serie.enviar("G91\nG1 Z5 F300\nG90")
                 elif y > center_y + 50:
                     cv2.putText(frame, "HOMBRO ABAJO", (50,100), cv2.FONT_HERSHEY_SIMPLEX, 1, (255,255,0), 2)
                     if ser:
-                        ser.write(b"G91\nG1 Z-5 F300\nG90\n")
+                        serie.enviar("G91\nG1 Z-5 F300\nG90")
 
                 last_mov_time = current_time
 
@@ -100,12 +108,12 @@ while cap.isOpened():
             if pinza_abierta and current_time - last_pinza_time > delay_pinza:
                 cv2.putText(frame, "PINZA ABIERTA", (50,150), cv2.FONT_HERSHEY_SIMPLEX, 1, (0,255,255), 2)
                 if ser:
-                    ser.write(b"M280 P2 S90\n")  # abrir
+                    serie.enviar("M280 P2 S90")  # abrir
                 last_pinza_time = current_time
             elif not pinza_abierta and current_time - last_pinza_time > delay_pinza:
                 cv2.putText(frame, "PINZA CERRADA", (50,150), cv2.FONT_HERSHEY_SIMPLEX, 1, (0,0,255), 2)
                 if ser:
-                    ser.write(b"M280 P2 S180\n")  # cerrar
+                    serie.enviar("M280 P2 S180")  # cerrar
                 last_pinza_time = current_time
 
     # Mostrar ventana
@@ -122,5 +130,6 @@ cv2.destroyAllWindows()
 
 # Todos los motores permanecen habilitados y energizados
 if ser:
+    serie.cerrar()
     ser.close()
 
@@ -2,6 +2,10 @@ import cv2
 import mediapipe as mp
 import serial
 import time
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "semana-06-10"))
+from camara import Camara
 
 # -------------------------
 # CONFIG SERIAL
@@ -28,7 +32,7 @@ hands = mp_hands.Hands(max_num_hands=1, min_detection_confidence=0.7, min_tracki
 # -------------------------
 # INICIO CAMARA
 # -------------------------
-cap = cv2.VideoCapture(0)
+cap = Camara(0)
 
 # -------------------------
 # RETARDO ENTRE COMANDOS
@@ -2,6 +2,10 @@ import cv2
 import mediapipe as mp
 import serial
 import time
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "semana-06-10"))
+from camara import Camara
 
 # -------------------------
 # CONFIG SERIAL
@@ -41,7 +45,7 @@ def mano_abierta(landmarks):
 # -------------------------
 # INICIO CAMARA
 # -------------------------
-cap = cv2.VideoCapture(0)
+cap = Camara(0)
 h, w = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
 center_x = w // 2
 center_y = h // 2
@@ -2,6 +2,10 @@ import cv2
 import mediapipe as mp
 import serial
 import time
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "semana-06-10"))
+from camara import Camara
 
 # ---- CONFIGURACIÓN SERIAL ----
 PORT = "/dev/ttyUSB0"   # Cambia si tu Arduino está en otro puerto
@@ -32,7 +36,7 @@ with mp_hands.Hands(
     ultimo_envio = 0
     delay = 0.3  # segundos entre comandos
 
-    cap = cv2.VideoCapture(0)
+    cap = Camara(0)
 
     while cap.isOpened():
         ret, frame = cap.read()
@@ -2,6 +2,11 @@ import cv2
 import mediapipe as mp
 import serial
 import time
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "semana-06-10"))
+from camara import Camara
+from escritor import Escritor
 
 # -------------------------
 # CONFIG SERIAL
@@ -16,6 +21,9 @@ except:
     print("Error: No se pudo conectar al puerto serial")
     ser = None
 
+# Comandos al brazo por semana-06-10/escritor.py (no se atrasa si la mano va mas rapido)
+serie = Escritor(ser) if ser else None
+
 # -------------------------
 # CONFIG MEDIAPIPE
 # -------------------------
@@ -30,7 +38,7 @@ hands = mp_hands.Hands(
 # -------------------------
 # CAMARA
 # -------------------------
-cap = cv2.VideoCapture(0)
+cap = Camara(0)
 
 # -------------------------
 # RETARDOS
@@ -75,14 +83,14 @@ while cap.isOpened():
                     cv2.putText(frame, "MUÑECA IZQ", (50,50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0,0,255), 2)
                     print("MUÑECA IZQ")
                     if ser:
-                        ser.write(b"G91\nG1 X-5 F400\nG90\n")
+                        serie.enviar("G91\nG1 X-5 F400\nG90")
                     last_command_time = current_time
 
                 elif x > center_x + 50:
                     cv2.putText(frame, "MUÑECA DER", (50,50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0,255,0), 2)
                     print("MUÑECA DER")
                     if ser:
-                        ser.write(b"G91\nG1 X5 F400\nG90\n")
+                        serie.enviar("G91\nG1 X5 F400\nG90")
                     last_command_time = current_time
 
                 # -------------------------
@@ -92,14 +100,14 @@ while cap.isOpened():
                     cv2.putText(frame, "CODO EXTENDER", (50,100), cv2.FONT_HERSHEY_SIMPLEX, 1, (255,0,0), 2)
                     print("CODO EXTENDER")
                     if ser:
-                        ser.write(b"G91\nG1 E5 F300\nG90\n")
+                        serie.enviar("G91\nG1 E5 F300\nG90")
                     last_command_time = current_time
 
                 elif y > center_y + 50:
                     cv2.putText(frame, "CODO RETRAER", (50,100), cv2.FONT_HERSHEY_SIMPLEX, 1, (255,255,0), 2)
                     print("CODO RETRAER")
                     if ser:
-                        ser.write(b"G91\nG1 E-5 F300\nG90\n")
+                        serie.enviar("G91\nG1 E-5 F300\nG90")
                     last_command_time = current_time
 
     # -------------------------
@@ -117,4 +125,5 @@ while cap.isOpened():
 cap.release()
 cv2.destroyAllWindows()
 if ser:
+    serie.cerrar()
     ser.close()